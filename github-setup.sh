@@ -107,7 +107,7 @@ else
 fi
 
 # Check for sensitive files
-SENSITIVE_FILES=(".env" "config/client_secrets.json" "config/token.pickle")
+SENSITIVE_FILES=(".env" "config/client_secrets.json" "config/token.json")
 FOUND_SENSITIVE=false
 
 for file in "${SENSITIVE_FILES[@]}"; do
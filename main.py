@@ -6,12 +6,18 @@ Runs the complete automated YouTube video creation and upload workflow
 
 import os
 import sys
-import json
 import asyncio
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from dotenv import load_dotenv
 
+try:
+    import fcntl
+except ImportError:  # Windows: topic rotation runs without a file lock
+    fcntl = None
+
 # Add scripts directory to path
 sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
 
@@ -23,6 +29,7 @@ try:
     from thumbnails import ThumbnailGenerator
     from compose import VideoComposer
     from upload import YouTubeUploader
+    from json_io import read_json, write_json, write_json_atomic
 except ImportError as e:
     print(f"❌ Failed to import pipeline modules: {str(e)}")
     print("   Make sure all dependencies are installed: pip install -r requirements.txt")
@@ -42,13 +49,19 @@ class PipelineOrchestrator:
         # Create timestamped run directory
         self.run_dir = Path(self.output_dir) / f'run_{self.run_timestamp}'
         
-    def run_full_pipeline(self, topic: Optional[str] = None, upload_to_youtube: bool = True) -> dict:
+    async def run_full_pipeline(
+        self,
+        topic: Optional[str] = None,
+        upload_to_youtube: bool = True,
+        use_cache: bool = True
+    ) -> dict:
         """
         Run the complete pipeline
         
         Args:
             topic: Optional topic override (uses topics.json if not provided)
             upload_to_youtube: Whether to upload the final video to YouTube
+            use_cache: Whether to reuse cached scripts and thumbnails for repeated topics
             
         Returns:
             Dictionary with pipeline results
@@ -74,12 +87,29 @@ class PipelineOrchestrator:
             topic_to_use = topic or self._get_next_topic()
             print(f"Topic: {topic_to_use}\n")
             
-            generator = ScriptGenerator()
-            script_data = generator.generate_script(topic_to_use)
+            generator = ScriptGenerator(use_cache=use_cache)
+            thumbnail_gen = ThumbnailGenerator(use_cache=use_cache)
+            
+            # Start rendering the thumbnail as soon as the title streams in,
+            # while the LLM is still writing the script body
+            loop = asyncio.get_running_loop()
+            early_thumbnail = {}
+            
+            def on_title(title: str) -> None:
+                early_thumbnail['title'] = title
+                early_thumbnail['future'] = asyncio.run_coroutine_threadsafe(
+                    asyncio.to_thread(thumbnail_gen.create_from_title, title),
+                    loop
+                )
+            
+            script_data = await asyncio.to_thread(
+                generator.generate_script,
+                topic_to_use,
+                on_title=on_title
+            )
             
             # Save script
-            with open(f'{self.output_dir}/script.json', 'w') as f:
-                json.dump(script_data, f, indent=2)
+            write_json(f'{self.output_dir}/script.json', script_data)
             
             results['stages']['script'] = {
                 'success': True,
@@ -89,27 +119,35 @@ class PipelineOrchestrator:
             
             print(f"\n✅ Script generated: {script_data['title']}")
             
-            # Stage 2: Voiceover Generation
+            # Stages 2-4 only depend on the script, so run them concurrently
             print("\n" + "="*70)
-            print("🎙️  STAGE 2: VOICEOVER GENERATION")
+            print("⚡ STAGES 2-4: VOICEOVER, VISUALS & THUMBNAIL (parallel)")
             print("-" * 70 + "\n")
             
-            audio_path = asyncio.run(generate_from_script_file())
+            # The fetcher's session must outlive its worker thread: gather
+            # waits for every stage even when one fails, and on cancellation
+            # (Ctrl-C) the private pool's exit joins the still-running thread
+            # before the session is closed
+            with VisualsFetcher() as fetcher, ThreadPoolExecutor(max_workers=1) as visuals_pool:
+                stage_results = await asyncio.gather(
+                    generate_from_script_file(),
+                    loop.run_in_executor(visuals_pool, fetcher.fetch_videos_for_script, script_data),
+                    self._finish_thumbnail(thumbnail_gen, script_data, early_thumbnail),
+                    return_exceptions=True
+                )
+            
+            for stage_result in stage_results:
+                if isinstance(stage_result, BaseException):
+                    raise stage_result
+            
+            audio_path, video_clips, thumbnail_path = stage_results
             
             results['stages']['voiceover'] = {
                 'success': True,
                 'audio_path': audio_path
             }
             
-            print(f"✅ Voiceover generated")
-            
-            # Stage 3: Visual Assets
-            print("\n" + "="*70)
-            print("📹 STAGE 3: FETCHING VISUAL ASSETS")
-            print("-" * 70 + "\n")
-            
-            fetcher = VisualsFetcher()
-            video_clips = fetcher.fetch_videos_for_script(script_data)
+            print(f"\n✅ Voiceover generated")
             
             results['stages']['visuals'] = {
                 'success': True,
@@ -118,14 +156,6 @@ class PipelineOrchestrator:
             
             print(f"✅ Downloaded {len(video_clips)} video clips")
             
-            # Stage 4: Thumbnail Generation
-            print("\n" + "="*70)
-            print("🎨 STAGE 4: THUMBNAIL GENERATION")
-            print("-" * 70 + "\n")
-            
-            thumbnail_gen = ThumbnailGenerator()
-            thumbnail_path = thumbnail_gen.create_from_script(script_data)
-            
             results['stages']['thumbnail'] = {
                 'success': True,
                 'thumbnail_path': thumbnail_path
@@ -139,7 +169,19 @@ class PipelineOrchestrator:
             print("-" * 70 + "\n")
             
             composer = VideoComposer()
-            video_path = composer.create_from_pipeline_output()
+            
+            # Authenticate with YouTube while ffmpeg encodes; the upload
+            # only needs the finished file
+            upload_prep = None
+            if upload_to_youtube:
+                upload_prep = asyncio.create_task(self._prepare_uploader())
+            
+            try:
+                video_path = await asyncio.to_thread(composer.create_from_pipeline_output)
+            except BaseException:
+                if upload_prep:
+                    upload_prep.cancel()
+                raise
             
             results['stages']['composition'] = {
                 'success': True,
@@ -155,8 +197,8 @@ class PipelineOrchestrator:
                 print("-" * 70 + "\n")
                 
                 try:
-                    uploader = YouTubeUploader()
-                    upload_response = uploader.upload_from_pipeline_output()
+                    uploader = await upload_prep
+                    upload_response = await asyncio.to_thread(uploader.upload_from_pipeline_output)
                     
                     results['stages']['upload'] = {
                         'success': True,
@@ -195,7 +237,8 @@ class PipelineOrchestrator:
             print(f"\n⏰ Completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             print("="*70 + "\n")
             
-        except KeyboardInterrupt:
+        # Under asyncio.run, Ctrl-C reaches the coroutine as a cancellation
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\n\n⚠️  Pipeline interrupted by user")
             results['success'] = False
             results['error'] = 'Interrupted by user'
@@ -209,39 +252,80 @@ class PipelineOrchestrator:
             print("\n🔍 Full error traceback:")
             traceback.print_exc()
         
-        # Save pipeline results
-        results_path = Path(self.output_dir) / 'pipeline_results.json'
-        with open(results_path, 'w') as f:
-            json.dump(results, f, indent=2)
+        finally:
+            # Save pipeline results
+            results_path = Path(self.output_dir) / 'pipeline_results.json'
+            write_json(results_path, results)
         
         return results
     
+    async def _finish_thumbnail(
+        self,
+        thumbnail_gen: ThumbnailGenerator,
+        script_data: dict,
+        early_thumbnail: dict
+    ) -> str:
+        """Await the thumbnail started from the streamed title, or render it now"""
+        
+        if early_thumbnail:
+            thumbnail_path = await asyncio.wrap_future(early_thumbnail['future'])
+            
+            # The streamed title can differ from the parsed one; only reuse
+            # the early render if it matches
+            if early_thumbnail['title'] == script_data['title']:
+                return thumbnail_path
+        
+        return await asyncio.to_thread(thumbnail_gen.create_from_script, script_data)
+    
+    async def _prepare_uploader(self) -> YouTubeUploader:
+        """Create the uploader and restore its saved YouTube session"""
+        
+        uploader = YouTubeUploader()
+        
+        # Only non-interactive auth happens here; a first-time OAuth flow
+        # still runs in upload_video once the video is ready
+        await asyncio.to_thread(uploader.prepare_session)
+        
+        return uploader
+    
     def _get_next_topic(self) -> str:
         """Get next topic from topics.json"""
         
-        topics_file = 'config/topics.json'
+        topics_file = Path('config/topics.json')
+        
+        # Lock a sidecar file: os.replace swaps the inode of topics.json, so
+        # a lock held on the data file itself would not serialize writers
+        lock_path = topics_file.with_name(topics_file.name + '.lock')
         
         try:
-            with open(topics_file, 'r') as f:
-                topics_data = json.load(f)
-            
-            topics = topics_data.get('topics', [])
-            if not topics:
-                return os.getenv('DEFAULT_TOPIC', 'Technology Trends')
-            
-            # Get current index
-            last_index = topics_data.get('last_used_index', 0)
-            
-            # Rotate to next topic
-            next_index = (last_index + 1) % len(topics)
-            next_topic = topics[next_index]['title']
-            
-            # Update index
-            topics_data['last_used_index'] = next_index
-            with open(topics_file, 'w') as f:
-                json.dump(topics_data, f, indent=2)
-            
-            return next_topic
+            with open(lock_path, 'w') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                
+                try:
+                    topics_data = read_json(topics_file)
+                    
+                    topics = topics_data.get('topics', [])
+                    if not topics:
+                        return os.getenv('DEFAULT_TOPIC', 'Technology Trends')
+                    
+                    # Get current index
+                    last_index = topics_data.get('last_used_index', 0)
+                    
+                    # Rotate to next topic
+                    next_index = (last_index + 1) % len(topics)
+                    next_topic = topics[next_index]['title']
+                    
+                    # Update index atomically so a crash never leaves a
+                    # half-written topics file behind
+                    topics_data['last_used_index'] = next_index
+                    write_json_atomic(topics_file, topics_data)
+                    
+                    return next_topic
+                    
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
             
         except Exception as e:
             print(f"⚠️  Could not load topics: {str(e)}")
@@ -266,15 +350,21 @@ def main():
         action='store_true',
         help='Skip YouTube upload (create video only)'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always call the LLM and render the thumbnail instead of reusing cached results'
+    )
     
     args = parser.parse_args()
     
     # Run pipeline
     orchestrator = PipelineOrchestrator()
-    results = orchestrator.run_full_pipeline(
+    results = asyncio.run(orchestrator.run_full_pipeline(
         topic=args.topic,
-        upload_to_youtube=not args.no_upload
-    )
+        upload_to_youtube=not args.no_upload,
+        use_cache=not args.no_cache
+    ))
     
     # Exit with appropriate code
     sys.exit(0 if results['success'] else 1)
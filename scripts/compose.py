@@ -1,21 +1,29 @@
 #!/usr/bin/env python3
 """
 Video Composer Module
-Combines video clips, audio, and creates the final video using MoviePy
+Combines video clips, audio, and creates the final video using ffmpeg
+(falls back to MoviePy when no ffmpeg binary is available)
 """
 
 import os
-import json
+import re
+import shutil
+import functools
+import threading
+import subprocess
 from pathlib import Path
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from json_io import read_json, write_json
+
 try:
     from moviepy.editor import (
         VideoFileClip, AudioFileClip, concatenate_videoclips,
         CompositeVideoClip, TextClip, ColorClip
     )
-    from moviepy.video.fx import resize, fadein, fadeout
+    from moviepy.video.fx import resize
     import moviepy.video.fx.all as vfx
     MOVIEPY_AVAILABLE = True
 except ImportError:
@@ -25,18 +33,160 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
+# Patterns for the stream summary ffmpeg prints for `ffmpeg -i <file>`
+_DURATION_RE = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+_VIDEO_STREAM_RE = re.compile(r'Stream #.*?Video:.*?, (\d{2,5})x(\d{2,5})')
+_FPS_RE = re.compile(r'([\d.]+) (?:fps|tbr)')
+
+# Hardware H.264 encoders in order of preference, with rate-control flags
+# roughly matching libx264 at CRF 23
+_HW_ENCODER_ARGS = {
+    'h264_nvenc': ['-preset', 'p4', '-rc', 'vbr', '-cq', '23', '-b:v', '0'],
+    'h264_videotoolbox': ['-q:v', '65'],
+    'h264_qsv': ['-preset', 'medium', '-global_quality', '23'],
+}
+_SOFTWARE_ENCODER_ARGS = ['-preset', 'medium', '-crf', '23']
+
+
+def _find_ffmpeg() -> Optional[str]:
+    """Locate an ffmpeg binary (FFMPEG_BINARY, PATH, then imageio-ffmpeg)"""
+    
+    binary = shutil.which(os.getenv('FFMPEG_BINARY', 'ffmpeg'))
+    if binary:
+        return binary
+    
+    # MoviePy ships its own ffmpeg through imageio-ffmpeg
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def _probe_media(ffmpeg: str, path: str) -> Dict[str, float]:
+    """Read duration, frame size and frame rate from ffmpeg's input summary"""
+    
+    result = subprocess.run(
+        [ffmpeg, '-hide_banner', '-i', path],
+        capture_output=True,
+        text=True
+    )
+    info = result.stderr
+    
+    duration_match = _DURATION_RE.search(info)
+    if not duration_match:
+        raise RuntimeError(f"Could not read media duration: {path}")
+    
+    hours, minutes, seconds = duration_match.groups()
+    media = {
+        'duration': int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        'width': 0,
+        'height': 0,
+        'fps': 0.0
+    }
+    
+    video_match = _VIDEO_STREAM_RE.search(info)
+    if video_match:
+        media['width'] = int(video_match.group(1))
+        media['height'] = int(video_match.group(2))
+        
+        stream_line = info[video_match.start():].split('\n', 1)[0]
+        fps_match = _FPS_RE.search(stream_line)
+        if fps_match:
+            media['fps'] = float(fps_match.group(1))
+    
+    return media
+
+
+@functools.lru_cache(maxsize=None)
+def _detect_video_encoder(ffmpeg: str) -> str:
+    """Pick the first hardware H.264 encoder that actually works, else libx264"""
+    
+    try:
+        listing = subprocess.run(
+            [ffmpeg, '-hide_banner', '-encoders'],
+            capture_output=True,
+            text=True,
+            timeout=15
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return 'libx264'
+    
+    for encoder in _HW_ENCODER_ARGS:
+        if f' {encoder} ' not in listing:
+            continue
+        
+        # Builds often list encoders whose hardware is missing, so run a
+        # tiny test encode before trusting it. It uses the same flags as the
+        # real encode, since some encoders reject them (e.g. -q:v on
+        # videotoolbox before Apple Silicon, -preset p4 on older nvenc)
+        try:
+            probe = subprocess.run(
+                [ffmpeg, '-hide_banner', '-loglevel', 'error',
+                 '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+                 '-c:v', encoder, *_HW_ENCODER_ARGS[encoder],
+                 '-pix_fmt', 'yuv420p', '-f', 'null', '-'],
+                capture_output=True,
+                timeout=15
+            )
+        except (OSError, subprocess.SubprocessError):
+            continue
+        
+        if probe.returncode == 0:
+            return encoder
+    
+    return 'libx264'
+
 
 class VideoComposer:
     """Compose final video from clips and audio"""
     
     def __init__(self):
-        if not MOVIEPY_AVAILABLE:
-            raise RuntimeError("MoviePy is required. Install with: pip install moviepy")
+        self.ffmpeg_binary = _find_ffmpeg()
+        
+        # 'ffmpeg' renders with a single ffmpeg process; 'moviepy' is the
+        # frame-by-frame Python path used when no ffmpeg binary is found
+        self.backend = os.getenv('COMPOSE_BACKEND', 'ffmpeg').lower()
+        if self.backend == 'ffmpeg' and not self.ffmpeg_binary:
+            self.backend = 'moviepy'
+        
+        if self.backend == 'moviepy' and not MOVIEPY_AVAILABLE:
+            raise RuntimeError(
+                "ffmpeg or MoviePy is required. "
+                "Install ffmpeg, or install MoviePy with: pip install moviepy"
+            )
         
         self.output_dir = os.getenv('OUTPUT_DIR', 'output')
         self.video_width = int(os.getenv('VIDEO_WIDTH', 1920))
         self.video_height = int(os.getenv('VIDEO_HEIGHT', 1080))
         self.video_fps = int(os.getenv('VIDEO_FPS', 30))
+        
+        # Output size and frame rate are fixed for the composer's lifetime, so
+        # the shape-dependent parts of the ffmpeg filter graph are built once
+        # and only the per-clip timings are filled in on each run
+        self._resize_filter = (
+            f"scale=-2:{self.video_height},"
+            f"crop=w=min(iw\\,{self.video_width}):h={self.video_height},"
+            f"pad={self.video_width}:{self.video_height}:(ow-iw)/2:0,"
+        )
+        self._clip_filter_tpl = (
+            "[{idx}:v]trim=start={start:.3f}:duration={duration:.3f},"
+            "setpts=(PTS-STARTPTS)/{speed:.4f},"
+            "{resize}"
+            f"setsar=1,fps={self.video_fps},format=yuv420p"
+            "{fades}[v{idx}]"
+        )
+        
+        # Video encoder: VIDEO_CODEC overrides, otherwise prefer hardware
+        self.video_codec = os.getenv('VIDEO_CODEC') or (
+            _detect_video_encoder(self.ffmpeg_binary) if self.ffmpeg_binary else 'libx264'
+        )
+        
+        # Clips opened/probed concurrently
+        self.max_workers = int(os.getenv('COMPOSE_WORKERS', min(4, os.cpu_count() or 1)))
+        
+        # Audio duration measured by the last create_video call
+        self._last_duration: Optional[float] = None
     
     def create_video(
         self,
@@ -68,9 +218,183 @@ class VideoComposer:
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
         
+        # Fail before any clip is opened or probed
+        missing = [path for path in video_clips if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Video clips not found: {', '.join(missing)}")
+        
+        output_path = Path(self.output_dir) / 'videos' / output_filename
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        if self.backend == 'ffmpeg':
+            self._create_with_ffmpeg(
+                video_clips,
+                audio_path,
+                output_path,
+                add_transitions,
+                transition_duration
+            )
+        else:
+            self._create_with_moviepy(
+                video_clips,
+                audio_path,
+                output_path,
+                add_transitions,
+                transition_duration
+            )
+        
+        print(f"✅ Video exported to: {output_path}")
+        
+        # Get file size
+        file_size_mb = output_path.stat().st_size / (1024 * 1024)
+        print(f"📊 File size: {file_size_mb:.2f} MB")
+        
+        return str(output_path)
+    
+    def _create_with_ffmpeg(
+        self,
+        video_clips: List[str],
+        audio_path: str,
+        output_path: Path,
+        add_transitions: bool,
+        transition_duration: float
+    ) -> None:
+        """Scale, crop, retime, fade and concatenate clips in one ffmpeg run"""
+        
+        target_duration = _probe_media(self.ffmpeg_binary, audio_path)['duration']
+        self._last_duration = target_duration
+        
+        print(f"🎵 Audio duration: {target_duration:.2f} seconds")
+        
+        duration_per_clip = target_duration / len(video_clips)
+        
+        print(f"⏱️  Target duration per clip: {duration_per_clip:.2f} seconds")
+        
+        # Probe all clips concurrently; each probe is its own ffmpeg process
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            clip_infos = list(executor.map(
+                lambda path: _probe_media(self.ffmpeg_binary, path),
+                video_clips
+            ))
+        
+        cmd = [self.ffmpeg_binary, '-hide_banner', '-loglevel', 'error', '-y']
+        filters = []
+        
+        for idx, (clip_path, clip_info) in enumerate(zip(video_clips, clip_infos)):
+            print(f"📹 Processing clip {idx + 1}/{len(video_clips)}: {Path(clip_path).name}")
+            
+            clip_duration = clip_info['duration']
+            
+            start_time = 0.0
+            speed_factor = 1.0
+            if clip_duration > duration_per_clip:
+                # Clip is longer, so trim it from the middle
+                start_time = (clip_duration - duration_per_clip) / 2
+            elif clip_duration / duration_per_clip > 0.5:
+                # Clip is shorter, so slow it down slightly
+                speed_factor = clip_duration / duration_per_clip
+            else:
+                # Too short to slow down, so loop the input instead
+                cmd += ['-stream_loop', '-1']
+            
+            cmd += ['-i', clip_path]
+            
+            # Clips already at the target size skip the resample entirely
+            needs_resize = (clip_info['width'], clip_info['height']) != (self.video_width, self.video_height)
+            
+            fades = ''
+            if add_transitions:
+                if idx > 0:  # Fade in (except first clip)
+                    fades += f",fade=t=in:st=0:d={transition_duration}"
+                if idx < len(video_clips) - 1:  # Fade out (except last clip)
+                    fade_start = max(duration_per_clip - transition_duration, 0)
+                    fades += f",fade=t=out:st={fade_start:.3f}:d={transition_duration}"
+            
+            filters.append(self._clip_filter_tpl.format(
+                idx=idx,
+                start=start_time,
+                duration=duration_per_clip * speed_factor,
+                speed=speed_factor,
+                resize=self._resize_filter if needs_resize else '',
+                fades=fades
+            ))
+        
+        concat_inputs = ''.join(f"[v{idx}]" for idx in range(len(video_clips)))
+        filters.append(f"{concat_inputs}concat=n={len(video_clips)}:v=1:a=0[vout]")
+        
+        cmd += [
+            '-i', audio_path,
+            '-filter_complex', ';'.join(filters),
+            '-map', '[vout]',
+            '-map', f'{len(video_clips)}:a:0',
+            '-t', f'{target_duration:.3f}',
+            '-c:v', self.video_codec,
+            *self._encoder_args(),
+            '-c:a', 'aac',
+            '-progress', 'pipe:1',
+            '-nostats',
+            str(output_path)
+        ]
+        
+        print(f"📤 Exporting video with ffmpeg ({self.video_codec})... (this may take a while)")
+        
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        
+        # ffmpeg streams key=value progress blocks on stdout; report them from
+        # a background thread while this one drains stderr
+        monitor = threading.Thread(
+            target=self._report_progress,
+            args=(process.stdout, target_duration),
+            daemon=True
+        )
+        monitor.start()
+        
+        errors = process.stderr.read()
+        returncode = process.wait()
+        monitor.join()
+        print()
+        
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {errors.strip()[-2000:]}")
+    
+    def _report_progress(self, stream, total_duration: float) -> None:
+        """Print encode progress parsed from ffmpeg's -progress output"""
+        
+        last_shown = -1
+        
+        for line in stream:
+            key, _, value = line.strip().partition('=')
+            
+            if key == 'out_time_us' and value.isdigit() and total_duration > 0:
+                progress = min(int(int(value) / 1e6 / total_duration * 100), 100)
+            elif key == 'progress' and value == 'end':
+                progress = 100
+            else:
+                continue
+            
+            if progress != last_shown:
+                print(f"\r   Encoding progress: {progress}%", end='', flush=True)
+                last_shown = progress
+    
+    def _create_with_moviepy(
+        self,
+        video_clips: List[str],
+        audio_path: str,
+        output_path: Path,
+        add_transitions: bool,
+        transition_duration: float
+    ) -> None:
+        """Compose the video frame by frame with MoviePy"""
+        
         # Load audio to get target duration
         audio = AudioFileClip(audio_path)
         target_duration = audio.duration
+        self._last_duration = target_duration
         
         print(f"🎵 Audio duration: {target_duration:.2f} seconds")
         
@@ -82,9 +406,17 @@ class VideoComposer:
             transition_duration
         )
         
-        # Concatenate clips
+        # Concatenate clips. "chain" skips the per-frame compositing pass and
+        # is safe once every clip fills the frame; narrower clips (after the
+        # height resize) still need "compose" to be centred on a canvas.
+        target_size = (self.video_width, self.video_height)
+        same_size = all(tuple(clip.size) == target_size for clip in clips)
+        
         print("🔗 Concatenating clips...")
-        final_video = concatenate_videoclips(clips, method="compose")
+        final_video = concatenate_videoclips(
+            clips,
+            method="chain" if same_size else "compose"
+        )
         
         # Ensure video matches audio duration
         if final_video.duration > target_duration:
@@ -99,22 +431,19 @@ class VideoComposer:
         print("🎵 Adding audio track...")
         final_video = final_video.set_audio(audio)
         
-        # Export final video
-        output_path = Path(self.output_dir) / 'videos' / output_filename
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        print(f"📤 Exporting video... (this may take a while)")
+        print(f"📤 Exporting video ({self.video_codec})... (this may take a while)")
         
+        # Encoder flags follow MoviePy's own -preset, so they take precedence
         final_video.write_videofile(
             str(output_path),
             fps=self.video_fps,
-            codec='libx264',
+            codec=self.video_codec,
             audio_codec='aac',
             temp_audiofile='temp-audio.m4a',
             remove_temp=True,
             threads=4,
             preset='medium',
-            ffmpeg_params=['-crf', '23']  # Quality setting (lower = better, 18-28 recommended)
+            ffmpeg_params=self._encoder_args()
         )
         
         # Clean up
@@ -122,14 +451,6 @@ class VideoComposer:
         for clip in clips:
             clip.close()
         final_video.close()
-        
-        print(f"✅ Video exported to: {output_path}")
-        
-        # Get file size
-        file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
-        print(f"📊 File size: {file_size_mb:.2f} MB")
-        
-        return str(output_path)
     
     def _load_and_process_clips(
         self,
@@ -137,7 +458,7 @@ class VideoComposer:
         total_duration: float,
         add_transitions: bool,
         transition_duration: float
-    ) -> List[VideoFileClip]:
+    ) -> List['VideoFileClip']:
         """Load and process video clips"""
         
         clips = []
@@ -145,50 +466,111 @@ class VideoComposer:
         
         print(f"⏱️  Target duration per clip: {duration_per_clip:.2f} seconds")
         
-        for idx, clip_path in enumerate(clip_paths):
-            if not os.path.exists(clip_path):
-                print(f"⚠️  Clip not found: {clip_path}, skipping...")
-                continue
+        # Each clip is opened and transformed independently; the decoding
+        # work happens in ffmpeg subprocesses, so threads overlap it well.
+        # Futures are read back in submission order to keep clip order.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self._process_one_clip,
+                    idx,
+                    clip_path,
+                    len(clip_paths),
+                    duration_per_clip,
+                    add_transitions,
+                    transition_duration
+                )
+                for idx, clip_path in enumerate(clip_paths)
+            ]
             
-            print(f"📹 Processing clip {idx + 1}/{len(clip_paths)}: {Path(clip_path).name}")
-            
-            # Load clip
-            clip = VideoFileClip(clip_path)
-            
-            # Resize to target dimensions
+            error = None
+            for future in futures:
+                try:
+                    clip = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                
+                clips.append(clip)
+        
+        if error:
+            for clip in clips:
+                clip.close()
+            raise error
+        
+        return clips
+    
+    def _process_one_clip(
+        self,
+        idx: int,
+        clip_path: str,
+        clip_count: int,
+        duration_per_clip: float,
+        add_transitions: bool,
+        transition_duration: float
+    ) -> 'VideoFileClip':
+        """Load and process a single clip"""
+        
+        print(f"📹 Processing clip {idx + 1}/{clip_count}: {Path(clip_path).name}")
+        
+        return self._process_clip(
+            VideoFileClip(clip_path),
+            idx,
+            clip_count,
+            duration_per_clip,
+            add_transitions,
+            transition_duration
+        )
+    
+    def _process_clip(
+        self,
+        clip: 'VideoFileClip',
+        idx: int,
+        clip_count: int,
+        duration_per_clip: float,
+        add_transitions: bool,
+        transition_duration: float
+    ) -> 'VideoFileClip':
+        """Resize, crop, retime and fade a single loaded clip"""
+        
+        # Resize to target dimensions (skipped when the height already matches)
+        if clip.h != self.video_height:
             clip = clip.fx(resize.resize, height=self.video_height)
-            
-            # If clip is wider than target, crop it
-            if clip.w > self.video_width:
-                x_center = clip.w / 2
-                x1 = x_center - self.video_width / 2
-                clip = clip.crop(x1=x_center - self.video_width/2, 
-                               x2=x_center + self.video_width/2)
-            
-            # Set duration for this clip
-            if clip.duration > duration_per_clip:
-                # Clip is longer, so trim it from the middle
-                start_time = (clip.duration - duration_per_clip) / 2
-                clip = clip.subclip(start_time, start_time + duration_per_clip)
+        
+        # If clip is wider than target, crop it
+        if clip.w > self.video_width:
+            x_center = clip.w / 2
+            clip = clip.crop(x1=x_center - self.video_width/2, 
+                           x2=x_center + self.video_width/2)
+        
+        # Set duration for this clip
+        if clip.duration > duration_per_clip:
+            # Clip is longer, so trim it from the middle
+            start_time = (clip.duration - duration_per_clip) / 2
+            clip = clip.subclip(start_time, start_time + duration_per_clip)
+        else:
+            # Clip is shorter, so slow it down slightly
+            speed_factor = clip.duration / duration_per_clip
+            if speed_factor > 0.5:  # Don't slow down too much
+                clip = clip.fx(vfx.speedx, speed_factor)
             else:
-                # Clip is shorter, so slow it down slightly
-                speed_factor = clip.duration / duration_per_clip
-                if speed_factor > 0.5:  # Don't slow down too much
-                    clip = clip.fx(vfx.speedx, speed_factor)
-                else:
-                    # If too short, just use as is and let concatenate handle it
-                    pass
-            
-            # Add transitions
-            if add_transitions:
-                if idx > 0:  # Fade in (except first clip)
-                    clip = clip.fx(fadein, transition_duration)
-                if idx < len(clip_paths) - 1:  # Fade out (except last clip)
-                    clip = clip.fx(fadeout, transition_duration)
-            
-            clips.append(clip)
+                # If too short, just use as is and let concatenate handle it
+                pass
         
-        return clips
+        # Add transitions
+        if add_transitions:
+            if idx > 0:  # Fade in (except first clip)
+                clip = clip.fx(vfx.fadein, transition_duration)
+            if idx < clip_count - 1:  # Fade out (except last clip)
+                clip = clip.fx(vfx.fadeout, transition_duration)
+        
+        return clip
+    
+    def _encoder_args(self) -> List[str]:
+        """Quality/rate-control flags for the selected video encoder"""
+        
+        # CRF 23 for libx264: lower = better, 18-28 recommended
+        return list(_HW_ENCODER_ARGS.get(self.video_codec, _SOFTWARE_ENCODER_ARGS))
     
     def create_from_pipeline_output(self) -> str:
         """
@@ -198,43 +580,54 @@ class VideoComposer:
             Path to final video file
         """
         
-        # Load metadata from previous steps
-        try:
-            with open(f'{self.output_dir}/visuals_metadata.json', 'r') as f:
-                visuals_meta = json.load(f)
-                video_clips = visuals_meta['downloaded_files']
-        except FileNotFoundError:
-            raise FileNotFoundError(
+        # Load metadata from previous steps; the three small reads are
+        # independent, so issue them concurrently
+        metadata_files = {
+            'visuals': (
+                f'{self.output_dir}/visuals_metadata.json',
                 "Visuals metadata not found. Run visuals.py first."
-            )
-        
-        try:
-            with open(f'{self.output_dir}/audio_metadata.json', 'r') as f:
-                audio_meta = json.load(f)
-                audio_path = audio_meta['audio_path']
-        except FileNotFoundError:
-            raise FileNotFoundError(
+            ),
+            'audio': (
+                f'{self.output_dir}/audio_metadata.json',
                 "Audio metadata not found. Run voiceover.py first."
+            ),
+            'script': (
+                f'{self.output_dir}/script.json',
+                "Script not found. Run script_generator.py first."
             )
+        }
+        
+        with ThreadPoolExecutor(max_workers=len(metadata_files)) as executor:
+            futures = {
+                name: executor.submit(read_json, path)
+                for name, (path, _) in metadata_files.items()
+            }
+        
+        metadata = {}
+        for name, future in futures.items():
+            try:
+                metadata[name] = future.result()
+            except FileNotFoundError:
+                raise FileNotFoundError(metadata_files[name][1])
+        
+        video_clips = metadata['visuals']['downloaded_files']
+        audio_path = metadata['audio']['audio_path']
+        script_data = metadata['script']
         
         # Create video
         video_path = self.create_video(video_clips, audio_path)
         
         # Save video metadata
-        with open(f'{self.output_dir}/script.json', 'r') as f:
-            script_data = json.load(f)
-        
         video_metadata = {
             "video_path": video_path,
             "title": script_data.get('title', 'Video'),
-            "duration": AudioFileClip(audio_path).duration,
+            "duration": self._last_duration,
             "clips_used": len(video_clips),
             "resolution": f"{self.video_width}x{self.video_height}",
             "fps": self.video_fps
         }
         
-        with open(f'{self.output_dir}/video_metadata.json', 'w') as f:
-            json.dump(video_metadata, f, indent=2)
+        write_json(f'{self.output_dir}/video_metadata.json', video_metadata)
         
         return video_path
 
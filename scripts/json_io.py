@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+JSON I/O Helpers
+Reads and writes the pipeline's JSON metadata files, using orjson when installed
+"""
+
+import os
+import json
+import functools
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    """Parse a JSON file"""
+    
+    data = Path(path).read_bytes()
+    
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    
+    return json.loads(data)
+
+
+def read_json_cached(path: Union[str, Path]) -> Any:
+    """
+    Parse a JSON file, reusing the previous parse while the file is unchanged
+    
+    The cache is keyed on the file's mtime and size, so edits are picked up
+    automatically. The returned object is shared between callers; treat it
+    as read-only.
+    """
+    
+    stat = os.stat(path)
+    return _read_json_version(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=8)
+def _read_json_version(path: str, mtime_ns: int, size: int) -> Any:
+    """Parse one version of a file (the stat fields are only cache keys)"""
+    
+    return read_json(path)
+
+
+def write_json(path: Union[str, Path], data: Any) -> None:
+    """Write data as indented JSON"""
+    
+    if ORJSON_AVAILABLE:
+        Path(path).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        Path(path).write_text(json.dumps(data, indent=2))
+
+
+def write_json_atomic(path: Union[str, Path], data: Any) -> None:
+    """
+    Write data as indented JSON, replacing the file in one step
+    
+    The JSON goes to a per-process temp file that is renamed over path,
+    so readers and crashes never see a half-written file.
+    """
+    
+    path = Path(path)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    write_json(tmp_path, data)
+    os.replace(tmp_path, path)
@@ -5,8 +5,12 @@ Generates video scripts using either Ollama (local) or Groq (cloud API)
 """
 
 import os
+import re
 import json
-from typing import Dict, Optional
+import hashlib
+import functools
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -28,22 +32,92 @@ except ImportError:
     print("⚠️  Groq not installed. Install with: pip install groq")
 
 
+# Captures the three sections of a well-formed response in one pass; the
+# script runs up to the first TAGS: marker (or the end if there is none)
+_SCRIPT_RE = re.compile(
+    r'TITLE:[ \t]*(?P<title>[^\n]*).*?'
+    r'SCRIPT:\s*(?P<script>.*?)\s*'
+    r'(?:TAGS:\s*(?P<tags>.*?))?\s*$',
+    re.S
+)
+
+# A complete title line, used to report the title while the body streams
+_TITLE_LINE_RE = re.compile(r'TITLE:[ \t]*([^\n]*)\n')
+
+
+def _cached_generation(model_attr: str):
+    """Memoize an LLM backend call on disk, keyed by model and prompt"""
+    
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(
+            self,
+            prompt: str,
+            topic: str,
+            on_title: Optional[Callable[[str], None]] = None
+        ) -> Dict[str, str]:
+            if not self.use_cache:
+                return method(self, prompt, topic, on_title)
+            
+            model = getattr(self, model_attr)
+            key = hashlib.sha256(f"{model}\n{prompt}".encode('utf-8')).hexdigest()
+            cache_path = self.cache_dir / f"{key}.json"
+            
+            if cache_path.exists():
+                try:
+                    with open(cache_path, 'r') as f:
+                        result = json.load(f)
+                    print(f"♻️  Using cached script for '{topic}' ({model})")
+                    if on_title:
+                        on_title(result['title'])
+                    return result
+                except (OSError, json.JSONDecodeError):
+                    pass  # Corrupt cache entry, regenerate
+            
+            result = method(self, prompt, topic, on_title)
+            
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, 'w') as f:
+                json.dump(result, f, indent=2)
+            
+            return result
+        
+        return wrapper
+    
+    return decorator
+
+
 class ScriptGenerator:
     """Generate video scripts using LLMs"""
     
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
         self.use_ollama = os.getenv('USE_OLLAMA', 'true').lower() == 'true'
         self.ollama_model = os.getenv('OLLAMA_MODEL', 'llama3.1:8b')
         self.groq_model = os.getenv('GROQ_MODEL', 'llama-3.1-8b-instant')
         self.groq_api_key = os.getenv('GROQ_API_KEY')
         
-    def generate_script(self, topic: str, duration: int = 60) -> Dict[str, str]:
+        # Created on first Groq call and reused for its connection pool
+        self._groq_client = None
+        
+        # Generated scripts are cached per (model, prompt) so repeat runs
+        # for the same topic skip the LLM round-trip
+        self.use_cache = use_cache
+        self.cache_dir = Path(os.getenv('OUTPUT_DIR', 'output')) / '.cache' / 'scripts'
+        
+    def generate_script(
+        self,
+        topic: str,
+        duration: int = 60,
+        on_title: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, str]:
         """
         Generate a video script for the given topic
         
         Args:
             topic: The topic/subject for the video
             duration: Target duration in seconds (default: 60)
+            on_title: Optional callback invoked with the title as soon as it
+                has streamed in, before the rest of the script is done
             
         Returns:
             Dictionary containing title, script, and metadata
@@ -53,11 +127,11 @@ class ScriptGenerator:
         
         # Use Ollama if available and configured
         if self.use_ollama and OLLAMA_AVAILABLE:
-            return self._generate_with_ollama(prompt, topic)
+            return self._generate_with_ollama(prompt, topic, on_title)
         
         # Otherwise use Groq
         elif GROQ_AVAILABLE and self.groq_api_key:
-            return self._generate_with_groq(prompt, topic)
+            return self._generate_with_groq(prompt, topic, on_title)
         
         else:
             raise RuntimeError(
@@ -100,7 +174,13 @@ Do not include timestamps, scene descriptions, or narrator notes. Just write the
 
         return prompt
     
-    def _generate_with_ollama(self, prompt: str, topic: str) -> Dict[str, str]:
+    @_cached_generation('ollama_model')
+    def _generate_with_ollama(
+        self,
+        prompt: str,
+        topic: str,
+        on_title: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, str]:
         """Generate script using local Ollama"""
         
         print(f"🤖 Generating script with Ollama ({self.ollama_model})...")
@@ -117,16 +197,26 @@ Do not include timestamps, scene descriptions, or narrator notes. Just write the
                         'role': 'user',
                         'content': prompt
                     }
-                ]
+                ],
+                stream=True
             )
             
-            content = response['message']['content']
+            content = self._collect_stream(
+                (chunk['message']['content'] for chunk in response),
+                on_title
+            )
             return self._parse_script_response(content, topic)
             
         except Exception as e:
             raise RuntimeError(f"Ollama generation failed: {str(e)}")
     
-    def _generate_with_groq(self, prompt: str, topic: str) -> Dict[str, str]:
+    @_cached_generation('groq_model')
+    def _generate_with_groq(
+        self,
+        prompt: str,
+        topic: str,
+        on_title: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, str]:
         """Generate script using Groq API"""
         
         print(f"🤖 Generating script with Groq ({self.groq_model})...")
@@ -135,9 +225,10 @@ Do not include timestamps, scene descriptions, or narrator notes. Just write the
             raise ValueError("GROQ_API_KEY not set in environment variables")
         
         try:
-            client = Groq(api_key=self.groq_api_key)
+            if self._groq_client is None:
+                self._groq_client = Groq(api_key=self.groq_api_key)
             
-            response = client.chat.completions.create(
+            response = self._groq_client.chat.completions.create(
                 model=self.groq_model,
                 messages=[
                     {
@@ -150,40 +241,56 @@ Do not include timestamps, scene descriptions, or narrator notes. Just write the
                     }
                 ],
                 temperature=0.7,
-                max_tokens=1024
+                max_tokens=1024,
+                stream=True
             )
             
-            content = response.choices[0].message.content
+            content = self._collect_stream(
+                (chunk.choices[0].delta.content or '' for chunk in response if chunk.choices),
+                on_title
+            )
             return self._parse_script_response(content, topic)
             
         except Exception as e:
             raise RuntimeError(f"Groq generation failed: {str(e)}")
     
+    def _collect_stream(
+        self,
+        pieces: Iterable[str],
+        on_title: Optional[Callable[[str], None]]
+    ) -> str:
+        """Join streamed response text, reporting the title once its line completes"""
+        
+        parts = []
+        title_pending = on_title is not None
+        
+        for piece in pieces:
+            parts.append(piece)
+            
+            if title_pending and '\n' in piece:
+                match = _TITLE_LINE_RE.search(''.join(parts))
+                if match:
+                    title_pending = False
+                    if match.group(1).strip():
+                        on_title(match.group(1).strip())
+        
+        return ''.join(parts)
+    
     def _parse_script_response(self, content: str, topic: str) -> Dict[str, str]:
         """Parse the LLM response into structured components"""
         
-        # Extract title
-        title = topic  # Default fallback
-        if "TITLE:" in content:
-            title_line = content.split("TITLE:")[1].split("\n")[0].strip()
-            if title_line:
-                title = title_line
-        
-        # Extract script
-        script = ""
-        if "SCRIPT:" in content and "TAGS:" in content:
-            script = content.split("SCRIPT:")[1].split("TAGS:")[0].strip()
-        elif "SCRIPT:" in content:
-            script = content.split("SCRIPT:")[1].strip()
+        match = _SCRIPT_RE.search(content)
+        if match:
+            title_line = match.group('title').strip()
+            script = match.group('script').strip()
+            tags_line = (match.group('tags') or '').strip()
         else:
-            # If no clear markers, use the whole content
-            script = content.strip()
+            title_line, script, tags_line = self._split_sections(content)
         
-        # Extract tags
-        tags = []
-        if "TAGS:" in content:
-            tags_line = content.split("TAGS:")[1].strip()
-            tags = [tag.strip() for tag in tags_line.split(",")]
+        # Fall back to the topic if the title is missing
+        title = title_line or topic
+        
+        tags = [tag.strip() for tag in tags_line.split(",") if tag.strip()]
         
         # If no tags, generate from topic
         if not tags:
@@ -196,6 +303,27 @@ Do not include timestamps, scene descriptions, or narrator notes. Just write the
             "topic": topic,
             "word_count": len(script.split())
         }
+    
+    def _split_sections(self, content: str) -> Tuple[str, str, str]:
+        """Marker-by-marker parsing for responses that miss TITLE: or SCRIPT:"""
+        
+        title_line = ""
+        if "TITLE:" in content:
+            title_line = content.split("TITLE:")[1].split("\n")[0].strip()
+        
+        if "SCRIPT:" in content and "TAGS:" in content:
+            script = content.split("SCRIPT:")[1].split("TAGS:")[0].strip()
+        elif "SCRIPT:" in content:
+            script = content.split("SCRIPT:")[1].strip()
+        else:
+            # If no clear markers, use the whole content
+            script = content.strip()
+        
+        tags_line = ""
+        if "TAGS:" in content:
+            tags_line = content.split("TAGS:")[1].strip()
+        
+        return title_line, script, tags_line
 
 
 def main():
@@ -6,20 +6,74 @@ Creates eye-catching YouTube thumbnails programmatically
 
 import os
 import json
+import bisect
+import shutil
+import hashlib
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from dotenv import load_dotenv
 
-try:
-    from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
+# Pillow and NumPy are only looked up here; they are imported where they
+# are used so that importing this module stays cheap
+PIL_AVAILABLE = find_spec('PIL') is not None
+if not PIL_AVAILABLE:
     print("⚠️  Pillow not installed. Install with: pip install Pillow")
 
+NUMPY_AVAILABLE = find_spec('numpy') is not None
+
 # Load environment variables
 load_dotenv()
 
+# Part of every thumbnail cache key; bump it whenever a change to the
+# layout, colours or effects should invalidate previously cached renders
+_RENDER_VERSION = 1
+
+# Common bold font paths for different systems
+TITLE_FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "C:\\Windows\\Fonts\\arialbd.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf"
+]
+
+
+@functools.lru_cache(maxsize=8)
+def _load_title_font(size: int) -> "ImageFont.ImageFont":
+    """Load the first available bold font, fallback to default (parsed once per size)"""
+    
+    from PIL import ImageFont
+    
+    try:
+        for font_path in TITLE_FONT_PATHS:
+            if os.path.exists(font_path):
+                return ImageFont.truetype(font_path, size)
+        
+        print("⚠️  Using default font. Install TrueType fonts for better results.")
+    except:
+        pass
+    
+    return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=None)
+def _ensure_thumbnail_dir(output_dir: str) -> Path:
+    """Create the thumbnails directory once per process and output dir"""
+    
+    thumbnail_dir = Path(output_dir) / 'thumbnails'
+    thumbnail_dir.mkdir(parents=True, exist_ok=True)
+    return thumbnail_dir
+
+
+def _render_thumbnail(title: str, output_filename: str, use_cache: bool = True) -> str:
+    """Process-pool worker: render one thumbnail with a generator local to the worker"""
+    
+    generator = ThumbnailGenerator(use_cache=use_cache)
+    return generator.create_thumbnail(title=title, output_filename=output_filename)
+
 
 class ThumbnailGenerator:
     """Generate YouTube thumbnails"""
@@ -27,13 +81,25 @@ class ThumbnailGenerator:
     # YouTube thumbnail recommended size
     THUMBNAIL_SIZE = (1280, 720)
     
-    def __init__(self):
+    # Darkens background images to 60% brightness for text readability;
+    # one entry per value for each of R, G and B, applied with Image.point.
+    # Matches ImageEnhance.Brightness(0.6) exactly without its blend against
+    # a black image
+    BACKGROUND_DARKEN_LUT = bytes(int(v * 0.6) for v in range(256)) * 3
+    
+    def __init__(self, use_cache: bool = True):
         if not PIL_AVAILABLE:
             raise RuntimeError("Pillow is required. Install with: pip install Pillow")
         
         self.output_dir = os.getenv('OUTPUT_DIR', 'output')
-        self.thumbnail_dir = Path(self.output_dir) / 'thumbnails'
-        self.thumbnail_dir.mkdir(parents=True, exist_ok=True)
+        self.thumbnail_dir = _ensure_thumbnail_dir(self.output_dir)
+        
+        # Rendered thumbnails are cached by their inputs so reruns with an
+        # unchanged title skip the whole Pillow pipeline
+        self.use_cache = use_cache
+        self.cache_dir = Path(self.output_dir) / '.cache' / 'thumbnails'
+        
+        self._title_font = _load_title_font(80)
     
     def create_thumbnail(
         self,
@@ -59,6 +125,16 @@ class ThumbnailGenerator:
             Path to generated thumbnail
         """
         
+        output_path = self.thumbnail_dir / output_filename
+        
+        cache_path = None
+        if self.use_cache:
+            cache_path = self.cache_dir / f"{self._cache_key(title, background_image, background_color, text_color, accent_color)}.jpg"
+            if cache_path.exists():
+                shutil.copyfile(cache_path, output_path)
+                print(f"♻️  Using cached thumbnail: {output_path}")
+                return str(output_path)
+        
         print(f"🎨 Creating thumbnail...")
         
         # Create base image
@@ -73,28 +149,73 @@ class ThumbnailGenerator:
         # Add visual enhancements
         thumbnail = self._add_visual_polish(thumbnail)
         
-        # Save thumbnail
-        output_path = self.thumbnail_dir / output_filename
-        thumbnail.save(output_path, "JPEG", quality=95, optimize=True)
+        # Save thumbnail (single-pass encode with 4:2:0 chroma; YouTube
+        # re-encodes thumbnails anyway, so optimize=True's second Huffman
+        # pass isn't worth the time)
+        thumbnail.save(output_path, "JPEG", quality=90, subsampling=2, progressive=False)
+        
+        if cache_path:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Copy under a private name and rename, so an interrupted copy or
+            # a parallel batch worker never sees a half-written cache entry
+            tmp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.tmp')
+            shutil.copyfile(output_path, tmp_path)
+            os.replace(tmp_path, cache_path)
         
         print(f"✅ Thumbnail saved to: {output_path}")
         
         return str(output_path)
     
-    def _create_from_image(self, image_path: str) -> Image.Image:
-        """Create thumbnail from existing image"""
+    def _cache_key(
+        self,
+        title: str,
+        background_image: Optional[str],
+        background_color: Tuple[int, int, int],
+        text_color: Tuple[int, int, int],
+        accent_color: Tuple[int, int, int]
+    ) -> str:
+        """Hash every input that affects the rendered thumbnail"""
         
-        img = Image.open(image_path)
+        background_mtime = None
+        if background_image and os.path.exists(background_image):
+            background_mtime = Path(background_image).stat().st_mtime_ns
+        
+        inputs = json.dumps([
+            _RENDER_VERSION,
+            getattr(self._title_font, 'path', None),
+            title,
+            background_image,
+            background_mtime,
+            background_color,
+            text_color,
+            accent_color,
+            self.THUMBNAIL_SIZE
+        ])
+        return hashlib.blake2b(inputs.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _create_from_image(self, image_path: str) -> "Image.Image":
+        """
+        Create thumbnail from existing image
+        
+        The Lanczos resize and blur here are the heaviest steps in thumbnail
+        generation; installing pillow-simd in place of Pillow speeds them up
+        with no code changes (see requirements.txt).
+        """
+        
+        from PIL import Image, ImageFilter
+        
+        img = Image.open(image_path).convert('RGB')
         
         # Resize to thumbnail dimensions
         img = img.resize(self.THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
         
         # Apply slight darkening for text readability
-        enhancer = ImageEnhance.Brightness(img)
-        img = enhancer.enhance(0.6)
+        img = img.point(self.BACKGROUND_DARKEN_LUT)
         
-        # Add slight blur to background
-        img = img.filter(ImageFilter.GaussianBlur(radius=2))
+        # Add slight blur to background (two box passes approximate a
+        # gaussian of the same radius at lower cost)
+        img = img.filter(ImageFilter.BoxBlur(2)).filter(ImageFilter.BoxBlur(2))
         
         return img
     
@@ -102,10 +223,25 @@ class ThumbnailGenerator:
         self, 
         base_color: Tuple[int, int, int],
         accent_color: Tuple[int, int, int]
-    ) -> Image.Image:
+    ) -> "Image.Image":
         """Create a gradient background"""
         
+        from PIL import Image, ImageDraw
+        
         width, height = self.THUMBNAIL_SIZE
+        
+        if NUMPY_AVAILABLE:
+            import numpy as np
+            
+            # Blend every row in one pass into a 1px-wide column, then let
+            # Pillow stretch it across the width (cheaper than materialising
+            # the full array in NumPy first)
+            ratio = (np.arange(height, dtype=np.float32) / height * 0.3)[:, None]
+            base = np.array(base_color, dtype=np.float32)
+            rows = (base + (np.array(accent_color, dtype=np.float32) - base) * ratio).astype(np.uint8)
+            column = Image.fromarray(rows[:, None, :], 'RGB')
+            return column.resize(self.THUMBNAIL_SIZE, Image.Resampling.NEAREST)
+        
         img = Image.new('RGB', self.THUMBNAIL_SIZE)
         draw = ImageDraw.Draw(img)
         
@@ -124,60 +260,41 @@ class ThumbnailGenerator:
     
     def _add_title_text(
         self,
-        img: Image.Image,
+        img: "Image.Image",
         title: str,
         text_color: Tuple[int, int, int],
         accent_color: Tuple[int, int, int]
-    ) -> Image.Image:
+    ) -> "Image.Image":
         """Add title text to thumbnail"""
         
+        from PIL import ImageDraw
+        
         draw = ImageDraw.Draw(img)
         width, height = img.size
         
-        # Try to load a bold font, fallback to default
-        try:
-            # Common font paths for different systems
-            font_paths = [
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-                "/System/Library/Fonts/Helvetica.ttc",
-                "C:\\Windows\\Fonts\\arialbd.ttf",
-                "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf"
-            ]
-            
-            font = None
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    font = ImageFont.truetype(font_path, 80)
-                    break
-            
-            if font is None:
-                font = ImageFont.load_default()
-                print("⚠️  Using default font. Install TrueType fonts for better results.")
-        except:
-            font = ImageFont.load_default()
+        font = self._title_font
         
-        # Split title into multiple lines if needed
+        # Split title into multiple lines if needed. Each word is measured
+        # once; prefix sums of (word + space) widths then give any run's width
+        # by subtraction, so each line break is a single bisect
         words = title.split()
         lines = []
-        current_line = []
+        space_width = font.getlength(' ')
+        max_width = width * 0.85
+        
+        # line_ends[k] = width of words[:k] with a trailing space after each
+        line_ends = [0.0, *itertools.accumulate(font.getlength(word) + space_width for word in words)]
         
-        for word in words:
-            current_line.append(word)
-            test_line = ' '.join(current_line)
+        start = 0
+        while start < len(words):
+            # Last end whose line (minus its trailing space) still fits
+            end = bisect.bisect_right(line_ends, line_ends[start] + max_width + space_width) - 1
             
-            # Check if line is too long
-            bbox = draw.textbbox((0, 0), test_line, font=font)
-            if bbox[2] - bbox[0] > width * 0.85:
-                if len(current_line) > 1:
-                    current_line.pop()
-                    lines.append(' '.join(current_line))
-                    current_line = [word]
-                else:
-                    lines.append(test_line)
-                    current_line = []
-        
-        if current_line:
-            lines.append(' '.join(current_line))
+            # A single word wider than the limit still gets its own line
+            end = max(end, start + 1)
+            
+            lines.append(' '.join(words[start:end]))
+            start = end
         
         # Limit to 3 lines
         lines = lines[:3]
@@ -199,42 +316,58 @@ class ThumbnailGenerator:
             # Center horizontally
             x = (width - text_width) // 2
             
-            # Draw text shadow for better readability
-            shadow_offset = 4
-            draw.text(
-                (x + shadow_offset, y + shadow_offset),
-                line,
-                font=font,
-                fill=(0, 0, 0, 180)
-            )
+            # Rasterize the line once, then stamp the same glyph mask twice:
+            # a shadow for better readability, then the main text
+            if hasattr(font, 'getmask2'):
+                mask, (offset_x, offset_y) = font.getmask2(line, 'L')
+            else:
+                mask, (offset_x, offset_y) = font.getmask(line, 'L'), (0, 0)
+            mask_width, mask_height = mask.size
             
-            # Draw main text
-            draw.text((x, y), line, font=font, fill=text_color)
+            shadow_offset = 4
+            for dx, fill in ((shadow_offset, (0, 0, 0)), (0, text_color)):
+                left = x + dx + offset_x
+                top = y + dx + offset_y
+                img.im.paste(fill, (left, top, left + mask_width, top + mask_height), mask)
             
             y += line_height
         
         # Add accent bar at bottom
         bar_height = 8
         bar_y = height - 60
-        draw.rectangle(
-            [(width * 0.1, bar_y), (width * 0.9, bar_y + bar_height)],
-            fill=accent_color
+        # Solid fill via paste; the box is end-exclusive, so +1 keeps the
+        # same pixels the inclusive draw.rectangle covered
+        img.paste(
+            accent_color,
+            (int(width * 0.1), bar_y, int(width * 0.9) + 1, bar_y + bar_height + 1)
         )
         
         return img
     
-    def _add_visual_polish(self, img: Image.Image) -> Image.Image:
+    def _add_visual_polish(self, img: "Image.Image") -> "Image.Image":
         """Add final visual polish to thumbnail"""
         
-        # Increase contrast slightly
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.2)
+        from PIL import ImageStat
         
-        # Increase saturation slightly
-        enhancer = ImageEnhance.Color(img)
-        img = enhancer.enhance(1.1)
+        contrast = 1.2    # Increase contrast slightly
+        saturation = 1.1  # Increase saturation slightly
         
-        return img
+        # Same maths as ImageEnhance.Contrast followed by ImageEnhance.Color,
+        # folded into one affine colour matrix so the image is touched once:
+        #   out = mean + contrast * (luma - mean) + contrast * saturation * (c - luma)
+        mean = int(ImageStat.Stat(img.convert('L')).mean[0] + 0.5)
+        luma_weights = (0.299, 0.587, 0.114)
+        
+        matrix = []
+        for channel in range(3):
+            for source in range(3):
+                weight = contrast * (1 - saturation) * luma_weights[source]
+                if source == channel:
+                    weight += contrast * saturation
+                matrix.append(weight)
+            matrix.append(mean * (1 - contrast))
+        
+        return img.convert('RGB', tuple(matrix))
     
     def create_from_script(self, script_data: Dict = None) -> str:
         """
@@ -256,7 +389,21 @@ class ThumbnailGenerator:
             except FileNotFoundError:
                 raise FileNotFoundError(f"Script file not found: {script_path}")
         
-        title = script_data.get('title', 'Video Title')
+        return self.create_from_title(script_data.get('title', 'Video Title'))
+    
+    def create_from_title(self, title: str) -> str:
+        """
+        Create thumbnail for a video title
+        
+        Only the title is needed, so the pipeline can start rendering as soon
+        as the title has streamed in from the LLM.
+        
+        Args:
+            title: Video title text
+            
+        Returns:
+            Path to generated thumbnail
+        """
         
         # Try to use first video clip as background
         background_image = None
@@ -287,6 +434,42 @@ class ThumbnailGenerator:
             json.dump(thumbnail_metadata, f, indent=2)
         
         return thumbnail_path
+    
+    def create_batch(
+        self,
+        script_list: List[Dict],
+        max_workers: Optional[int] = None
+    ) -> List[str]:
+        """
+        Create thumbnails for several scripts in parallel worker processes
+        
+        Args:
+            script_list: Script dictionaries (only 'title' is used)
+            max_workers: Worker processes (default THUMBNAIL_WORKERS or CPU count)
+            
+        Returns:
+            Paths to generated thumbnails, in the same order as script_list
+        """
+        
+        if not script_list:
+            return []
+        
+        titles = [script_data.get('title', 'Video Title') for script_data in script_list]
+        filenames = [f"thumbnail_{idx + 1}.jpg" for idx in range(len(titles))]
+        
+        if max_workers is None:
+            max_workers = int(os.getenv('THUMBNAIL_WORKERS', os.cpu_count() or 1))
+        max_workers = max(1, min(max_workers, len(titles)))
+        
+        print(f"🎨 Creating {len(titles)} thumbnails with {max_workers} workers...")
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(
+                _render_thumbnail,
+                titles,
+                filenames,
+                [self.use_cache] * len(titles)
+            ))
 
 
 def main():
@@ -6,20 +6,19 @@ Uploads videos to YouTube using the YouTube Data API v3
 
 import os
 import json
-import pickle
+import mmap
+from importlib.util import find_spec
 from pathlib import Path
 from typing import Dict, Optional
 from dotenv import load_dotenv
 
-try:
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from google.auth.transport.requests import Request
-    from googleapiclient.discovery import build
-    from googleapiclient.http import MediaFileUpload
-    from googleapiclient.errors import HttpError
-    YOUTUBE_API_AVAILABLE = True
-except ImportError:
-    YOUTUBE_API_AVAILABLE = False
+# The Google client libraries take a few hundred ms to import, so they are
+# only looked up here and imported once the uploader actually needs them
+YOUTUBE_API_AVAILABLE = all(
+    find_spec(name) is not None
+    for name in ('googleapiclient', 'google_auth_oauthlib', 'google_auth_httplib2', 'httplib2')
+)
+if not YOUTUBE_API_AVAILABLE:
     print("⚠️  Google API libraries not installed.")
     print("    Install with: pip install google-api-python-client google-auth-oauthlib")
 
@@ -33,6 +32,10 @@ class YouTubeUploader:
     # OAuth 2.0 scopes
     SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
     
+    # Resumable upload chunk size; bigger chunks mean fewer round trips
+    # (must be a multiple of 256 KB)
+    UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+    
     def __init__(self):
         if not YOUTUBE_API_AVAILABLE:
             raise RuntimeError(
@@ -46,8 +49,8 @@ class YouTubeUploader:
             'config/client_secrets.json'
         )
         self.token_file = os.getenv(
-            'TOKEN_PICKLE_PATH',
-            'config/token.pickle'
+            'TOKEN_PATH',
+            'config/token.json'
         )
         
         self.category_id = os.getenv('YOUTUBE_CATEGORY_ID', '22')  # People & Blogs
@@ -58,58 +61,116 @@ class YouTubeUploader:
     def authenticate(self) -> None:
         """Authenticate with YouTube API"""
         
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        
+        credentials = self._load_saved_credentials()
+        
+        # If credentials are invalid or don't exist, get new ones
+        if not credentials:
+            if not os.path.exists(self.client_secrets_file):
+                raise FileNotFoundError(
+                    f"OAuth client secrets file not found: {self.client_secrets_file}\n"
+                    "Please download it from Google Cloud Console and place it in config/"
+                )
+            
+            print("🔐 Starting OAuth authentication flow...")
+            print("    A browser window will open for you to authorize the app.")
+            
+            flow = InstalledAppFlow.from_client_secrets_file(
+                self.client_secrets_file,
+                self.SCOPES
+            )
+            
+            credentials = flow.run_local_server(
+                port=8080,
+                authorization_prompt_message='Please visit this URL: {url}',
+                success_message='Authentication successful! You can close this window.',
+                open_browser=True
+            )
+            
+            self._save_credentials(credentials)
+        
+        self._build_client(credentials)
+    
+    def prepare_session(self) -> bool:
+        """
+        Authenticate from saved credentials without user interaction
+        
+        Lets the pipeline refresh tokens and build the API client while the
+        video is still being encoded.
+        
+        Returns:
+            True if the client is ready, False if an interactive OAuth flow
+            is still needed (it will run on the first upload)
+        """
+        
+        if self.youtube:
+            return True
+        
+        credentials = self._load_saved_credentials()
+        if not credentials:
+            return False
+        
+        self._build_client(credentials)
+        return True
+    
+    def _load_saved_credentials(self):
+        """Load saved credentials, refreshing them if not valid (None if unusable)"""
+        
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        
         credentials = None
         
         # Try to load saved credentials
         if os.path.exists(self.token_file):
             print("🔑 Loading saved credentials...")
             try:
-                with open(self.token_file, 'rb') as token:
-                    credentials = pickle.load(token)
+                credentials = Credentials.from_authorized_user_file(
+                    self.token_file,
+                    self.SCOPES
+                )
             except Exception as e:
                 print(f"⚠️  Failed to load credentials: {str(e)}")
                 credentials = None
         
-        # If credentials are invalid or don't exist, get new ones
-        if not credentials or not credentials.valid:
-            if credentials and credentials.expired and credentials.refresh_token:
-                print("🔄 Refreshing expired credentials...")
+        # Refresh anything not currently valid, including a token.json that
+        # only carries a refresh token (no expiry), as seeded from CI secrets
+        if credentials and not credentials.valid:
+            if credentials.refresh_token:
+                print("🔄 Refreshing credentials...")
                 try:
                     credentials.refresh(Request())
+                    self._save_credentials(credentials)
                 except Exception as e:
                     print(f"⚠️  Refresh failed: {str(e)}")
                     credentials = None
-            
-            if not credentials:
-                if not os.path.exists(self.client_secrets_file):
-                    raise FileNotFoundError(
-                        f"OAuth client secrets file not found: {self.client_secrets_file}\n"
-                        "Please download it from Google Cloud Console and place it in config/"
-                    )
-                
-                print("🔐 Starting OAuth authentication flow...")
-                print("    A browser window will open for you to authorize the app.")
-                
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.client_secrets_file,
-                    self.SCOPES
-                )
-                
-                credentials = flow.run_local_server(
-                    port=8080,
-                    authorization_prompt_message='Please visit this URL: {url}',
-                    success_message='Authentication successful! You can close this window.',
-                    open_browser=True
-                )
-            
-            # Save credentials for future runs
-            print("💾 Saving credentials for future use...")
-            Path(self.token_file).parent.mkdir(parents=True, exist_ok=True)
-            with open(self.token_file, 'wb') as token:
-                pickle.dump(credentials, token)
-        
-        # Build YouTube API client
-        self.youtube = build('youtube', 'v3', credentials=credentials)
+            else:
+                credentials = None
+        
+        return credentials
+    
+    def _save_credentials(self, credentials) -> None:
+        """Save credentials for future runs"""
+        
+        print("💾 Saving credentials for future use...")
+        Path(self.token_file).parent.mkdir(parents=True, exist_ok=True)
+        Path(self.token_file).write_text(credentials.to_json())
+    
+    def _build_client(self, credentials) -> None:
+        """Build YouTube API client"""
+        
+        import google_auth_httplib2
+        import httplib2
+        from googleapiclient.discovery import build
+        
+        # One authorized Http object for the whole session, so every upload
+        # chunk reuses the same keep-alive TCP/TLS connection
+        http = google_auth_httplib2.AuthorizedHttp(
+            credentials,
+            http=httplib2.Http(timeout=60)
+        )
+        self.youtube = build('youtube', 'v3', http=http, cache_discovery=False, static_discovery=True)
         print("✅ Authentication successful!")
     
     def upload_video(
@@ -138,6 +199,8 @@ class YouTubeUploader:
             Response dictionary with video details
         """
         
+        from googleapiclient.errors import HttpError
+        
         if not self.youtube:
             self.authenticate()
         
@@ -166,32 +229,14 @@ class YouTubeUploader:
             }
         }
         
-        # Create media file upload
+        # Upload video
         print(f"📤 Uploading video: {Path(video_path).name}")
         print(f"   Title: {title}")
         print(f"   Privacy: {privacy_status}")
         
-        media = MediaFileUpload(
-            video_path,
-            chunksize=1024*1024,  # 1MB chunks
-            resumable=True,
-            mimetype='video/mp4'
-        )
-        
         try:
             # Execute upload
-            request = self.youtube.videos().insert(
-                part='snippet,status',
-                body=body,
-                media_body=media
-            )
-            
-            response = None
-            while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    progress = int(status.progress() * 100)
-                    print(f"   Upload progress: {progress}%", end='\r', flush=True)
+            response = self._insert_video(video_path, body)
             
             print(f"\n✅ Upload complete!")
             
@@ -219,11 +264,52 @@ class YouTubeUploader:
             print(f"\n❌ Upload failed: {error_message}")
             raise
     
+    def _insert_video(self, video_path: str, body: Dict) -> Dict:
+        """Run the resumable videos.insert upload, reading chunks from a memory map"""
+        
+        from googleapiclient.http import MediaIoBaseUpload
+        
+        # Serving chunks from an mmap lets the kernel read ahead and skips
+        # copying each chunk through a file object's buffer
+        with open(video_path, 'rb') as video_file, \
+                mmap.mmap(video_file.fileno(), 0, access=mmap.ACCESS_READ) as video_map:
+            media = MediaIoBaseUpload(
+                video_map,
+                mimetype='video/mp4',
+                chunksize=self.UPLOAD_CHUNK_SIZE,
+                resumable=True
+            )
+            
+            request = self.youtube.videos().insert(
+                part='snippet,status',
+                body=body,
+                media_body=media
+            )
+            
+            response = None
+            last_shown = -1
+            while response is None:
+                status, response = request.next_chunk()
+                if status:
+                    # Only redraw when the whole-percent value changes
+                    progress = int(status.progress() * 100)
+                    if progress != last_shown:
+                        print(f"   Upload progress: {progress}%", end='\r', flush=True)
+                        last_shown = progress
+        
+        return response
+    
     def _upload_thumbnail(self, video_id: str, thumbnail_path: str) -> None:
         """Upload custom thumbnail for video"""
         
+        from googleapiclient.errors import HttpError
+        from googleapiclient.http import MediaFileUpload
+        
         print(f"🖼️  Uploading thumbnail...")
         
+        # Goes over the same authorized keep-alive connection as the video
+        # upload, so no new TLS handshake. It can't be folded into a batch
+        # request: batches don't carry media bodies, and it needs the video ID.
         try:
             self.youtube.thumbnails().set(
                 videoId=video_id,
@@ -5,17 +5,121 @@ Downloads stock videos and images from Pexels API
 """
 
 import os
-import json
+import sys
 import time
+import shutil
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
+from json_io import read_json, read_json_cached, write_json, write_json_atomic
+
 # Load environment variables
 load_dotenv()
 
 
+@functools.lru_cache(maxsize=4)
+def _topic_index(path: str, mtime_ns: int) -> Dict[str, Dict]:
+    """Map lower-cased topic titles to topics for one version of topics.json"""
+    
+    index = {}
+    for topic in read_json_cached(path).get('topics', []):
+        index.setdefault(topic['title'].lower(), topic)
+    return index
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket for rate-limited API calls
+    
+    Refills at `rate` tokens per second up to `capacity`. The state is
+    corrected from the server's rate-limit headers after every response,
+    so concurrent callers wait only when the quota is actually used up.
+    A server-imposed pause longer than `max_wait` seconds (an exhausted
+    monthly quota, say) raises instead of blocking the pipeline for days.
+    """
+    
+    def __init__(self, rate: float, capacity: int, max_wait: float = 60.0):
+        self.rate = rate
+        self.max_wait = max_wait
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Take one token, sleeping until one is available"""
+        
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                wait = self.blocked_until - now
+                if wait > self.max_wait:
+                    resets_in = f"{wait / 3600:.1f} hours" if wait >= 3600 else f"{wait:.0f} seconds"
+                    raise RuntimeError(f"Pexels rate limit exhausted; it resets in {resets_in}")
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            
+            time.sleep(wait)
+    
+    def update(self, response: requests.Response) -> None:
+        """Sync with X-Ratelimit-Remaining / X-Ratelimit-Reset and Retry-After"""
+        
+        headers = response.headers
+        
+        with self.lock:
+            now = time.monotonic()
+            
+            remaining = headers.get('x-ratelimit-remaining', '')
+            if remaining.isdigit():
+                self.tokens = min(self.tokens, float(remaining))
+                
+                # Out of quota: hold every caller until the window resets
+                # (acquire fails fast if that is more than max_wait away)
+                reset = headers.get('x-ratelimit-reset', '')
+                if int(remaining) == 0 and reset.isdigit():
+                    self.blocked_until = max(self.blocked_until, now + int(reset) - time.time())
+            
+            retry_after = headers.get('retry-after', '')
+            if retry_after.isdigit():
+                self.blocked_until = max(self.blocked_until, now + int(retry_after))
+
+
+class _ProgressWriter:
+    """File wrapper that prints download progress at most 10 times a second"""
+    
+    def __init__(self, f, total_size: int):
+        self.f = f
+        self.total_size = total_size
+        self.written = 0
+        self.last_shown = 0.0
+    
+    def write(self, data: bytes) -> int:
+        self.written += len(data)
+        
+        now = time.monotonic()
+        if now - self.last_shown >= 0.1:
+            progress = (self.written / self.total_size) * 100
+            print(f"\r   Progress: {progress:.1f}%", end='', flush=True)
+            self.last_shown = now
+        
+        return self.f.write(data)
+
+
 class VisualsFetcher:
     """Fetch stock videos and images from Pexels"""
     
@@ -31,10 +135,66 @@ class VisualsFetcher:
         self.headers = {"Authorization": self.api_key}
         self.output_dir = os.getenv('OUTPUT_DIR', 'output')
         
+        # One pooled session for every search and download, so repeat
+        # requests to the API and video CDN hosts reuse TLS connections.
+        # The API key is sent per search request rather than set on the
+        # session so it never goes to the CDN hosts serving downloads.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            # 429 is left to the rate limiter, which reads its Retry-After
+            # (and fails fast on long waits) in search_videos. urllib3 would
+            # otherwise retry any 429 carrying Retry-After on its own
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[500, 502, 503, 504],
+                respect_retry_after_header=False
+            )
+        )
+        self.session.mount("https://", adapter)
+        
+        # Pexels allows PEXELS_RATE_LIMIT API requests per hour; downloads
+        # come from the video CDN and don't count against it
+        rate_limit = int(os.getenv('PEXELS_RATE_LIMIT', 200))
+        self.rate_limiter = TokenBucket(rate=rate_limit / 3600, capacity=rate_limit)
+        self.rate_limit_attempts = 3
+        
+        # Clips downloaded at once (kept within the adapter's pool size)
+        self.max_downloads = int(os.getenv('PEXELS_MAX_DOWNLOADS', 4))
+        
+        # Files at least this big are split into parallel Range requests
+        self.range_download_parts = 4
+        self.range_download_min_bytes = 8 * 1024 * 1024
+        
+        # Seconds without writes after which a .part file counts as abandoned
+        self.stale_part_age = 3600
+        
+        # Read size for single-connection downloads
+        self.copy_buffer_size = 1024 * 1024
+        
+        # ETag / Last-Modified of every downloaded clip, so later runs can
+        # revalidate a file with a conditional HEAD instead of refetching it
+        self.download_cache_path = Path(self.output_dir) / '.cache' / 'visuals_cache.json'
+        self._download_cache = None
+        self._download_cache_lock = threading.Lock()
+        
         # API endpoints
         self.video_search_url = "https://api.pexels.com/videos/search"
         self.photo_search_url = "https://api.pexels.com/v1/search"
     
+    def close(self) -> None:
+        """Close pooled HTTP connections"""
+        
+        self.session.close()
+    
+    def __enter__(self) -> "VisualsFetcher":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
     def search_videos(
         self, 
         query: str, 
@@ -64,12 +224,20 @@ class VisualsFetcher:
         }
         
         try:
-            response = requests.get(
-                self.video_search_url,
-                headers=self.headers,
-                params=params,
-                timeout=30
-            )
+            # A 429 blocks the rate limiter for its Retry-After, so the
+            # next acquire waits it out (or raises if it is too long)
+            for attempt in range(self.rate_limit_attempts):
+                self.rate_limiter.acquire()
+                response = self.session.get(
+                    self.video_search_url,
+                    headers=self.headers,
+                    params=params,
+                    timeout=30
+                )
+                self.rate_limiter.update(response)
+                
+                if response.status_code != 429:
+                    break
             
             response.raise_for_status()
             data = response.json()
@@ -147,33 +315,184 @@ class VisualsFetcher:
         output_path.mkdir(parents=True, exist_ok=True)
         
         filepath = output_path / filename
+        cache_key = f"{subfolder}/{filename}"
         
-        print(f"⬇️  Downloading: {filename}")
+        # Data goes to a .part file that only replaces filepath once it is
+        # complete, so an interrupted download never looks like a finished clip
+        part_path = filepath.with_name(f'{filepath.name}.{os.getpid()}.part')
         
         try:
-            response = requests.get(url, stream=True, timeout=60)
+            # Revalidate a clip left by an earlier run of the same URL
+            cached = self._cached_download(cache_key, url, filepath)
+            conditional = {}
+            if cached:
+                if cached.get('etag'):
+                    conditional['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    conditional['If-Modified-Since'] = cached['last_modified']
+            
+            head = self._probe_download(url, conditional)
+            
+            if cached and self._is_unchanged(cached, head):
+                print(f"♻️  Using cached clip: {filepath}")
+                return str(filepath)
+            
+            print(f"⬇️  Downloading: {filename}")
+            
+            # Large files are fetched as parallel byte ranges when the server
+            # supports it; anything else streams over a single connection
+            total_size = self._range_size(head)
+            
+            if total_size >= self.range_download_min_bytes and \
+                    self._download_ranges(head.url, part_path, total_size):
+                os.replace(part_path, filepath)
+                self._record_download(cache_key, url, filepath, head.headers)
+                print(f"✅ Downloaded: {filepath}")
+                return str(filepath)
+            
+            response = self.session.get(url, stream=True, timeout=60)
             response.raise_for_status()
             
-            # Download with progress indication
+            # Copy the body straight from the socket in 1 MiB reads; the
+            # loop runs inside shutil rather than per chunk in Python
+            response.raw.decode_content = True
+            
+            # Download with progress indication, redrawn at most 10 times a
+            # second and only on a terminal (\r is just noise in CI logs)
             total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
+            show_progress = total_size > 0 and sys.stdout.isatty()
             
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        # Simple progress indicator
-                        if total_size > 0:
-                            progress = (downloaded / total_size) * 100
-                            print(f"\r   Progress: {progress:.1f}%", end='', flush=True)
+            with response, open(part_path, 'wb') as f:
+                target = _ProgressWriter(f, total_size) if show_progress else f
+                shutil.copyfileobj(response.raw, target, self.copy_buffer_size)
             
-            print(f"\n✅ Downloaded: {filepath}")
+            if show_progress:
+                print(f"\r   Progress: 100.0%")
+            os.replace(part_path, filepath)
+            self._record_download(cache_key, url, filepath, response.headers)
+            print(f"✅ Downloaded: {filepath}")
             return str(filepath)
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
             raise RuntimeError(f"Failed to download video: {str(e)}")
+        finally:
+            # Left over only if the download failed or was interrupted
+            part_path.unlink(missing_ok=True)
+    
+    def _probe_download(self, url: str, headers: Dict[str, str]) -> Optional[requests.Response]:
+        """HEAD a download URL (following redirects), or None if the request failed"""
+        
+        try:
+            return self.session.head(url, headers=headers, allow_redirects=True, timeout=30)
+        except requests.exceptions.RequestException:
+            return None
+    
+    def _range_size(self, head: Optional[requests.Response]) -> int:
+        """
+        Size in bytes from a HEAD response, or 0 when the server doesn't
+        advertise byte-range support or a length
+        """
+        
+        if head is None or head.status_code != 200 or head.headers.get('accept-ranges') != 'bytes':
+            return 0
+        
+        return int(head.headers.get('content-length', 0))
+    
+    def _cached_download(self, cache_key: str, url: str, filepath: Path) -> Optional[Dict]:
+        """Cache entry for a file still on disk from the same URL, if any"""
+        
+        with self._download_cache_lock:
+            if self._download_cache is None:
+                try:
+                    self._download_cache = read_json(self.download_cache_path)
+                except (OSError, ValueError):
+                    self._download_cache = {}
+            entry = self._download_cache.get(cache_key)
+        
+        if not entry or entry.get('url') != url:
+            return None
+        
+        try:
+            if filepath.stat().st_size != entry.get('size'):
+                return None
+        except OSError:
+            return None
+        
+        return entry
+    
+    def _is_unchanged(self, cached: Dict, head: Optional[requests.Response]) -> bool:
+        """Whether a (conditional) HEAD response confirms the cached file is current"""
+        
+        if head is None:
+            return False
+        
+        if head.status_code == 304:
+            return True
+        
+        if head.status_code != 200:
+            return False
+        
+        if cached.get('etag'):
+            return head.headers.get('etag') == cached['etag']
+        
+        # No validator was stored; a matching length is the best evidence
+        return int(head.headers.get('content-length', -1)) == cached.get('size')
+    
+    def _record_download(self, cache_key: str, url: str, filepath: Path, headers) -> None:
+        """Remember a finished download's validators in visuals_cache.json"""
+        
+        entry = {
+            "url": url,
+            "etag": headers.get('etag'),
+            "last_modified": headers.get('last-modified'),
+            "size": filepath.stat().st_size
+        }
+        
+        with self._download_cache_lock:
+            self._download_cache[cache_key] = entry
+            self.download_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(self.download_cache_path, self._download_cache)
+    
+    def _download_ranges(self, url: str, filepath: Path, total_size: int) -> bool:
+        """
+        Download a file as concurrent byte ranges written in place
+        
+        Returns:
+            False if the server ignored the Range header (caller should fall
+            back to a plain download)
+        """
+        
+        part_size = -(-total_size // self.range_download_parts)
+        ranges = [
+            (start, min(start + part_size, total_size) - 1)
+            for start in range(0, total_size, part_size)
+        ]
+        
+        # Preallocate so every part can seek to its offset
+        with open(filepath, 'wb') as f:
+            f.truncate(total_size)
+        
+        def fetch_range(byte_range: Tuple[int, int]) -> bool:
+            start, end = byte_range
+            with self.session.get(
+                url,
+                headers={"Range": f"bytes={start}-{end}"},
+                stream=True,
+                timeout=60
+            ) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    return False
+                
+                # Each part has its own handle, so no locking is needed
+                with open(filepath, 'r+b') as f:
+                    f.seek(start)
+                    for chunk in response.iter_content(chunk_size=65536):
+                        f.write(chunk)
+            return True
+        
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            return all(executor.map(fetch_range, ranges))
     
     def fetch_videos_for_script(self, script_data: Dict = None) -> List[str]:
         """
@@ -190,24 +509,29 @@ class VisualsFetcher:
         if script_data is None:
             script_path = f"{self.output_dir}/script.json"
             try:
-                with open(script_path, 'r') as f:
-                    script_data = json.load(f)
+                script_data = read_json_cached(script_path)
             except FileNotFoundError:
                 raise FileNotFoundError(f"Script file not found: {script_path}")
         
         # Load topics for visual queries
         try:
-            with open('config/topics.json', 'r') as f:
-                topics_data = json.load(f)
+            topics_path = 'config/topics.json'
+            topics = _topic_index(topics_path, os.stat(topics_path).st_mtime_ns)
             
-            # Find matching topic
-            script_topic = script_data.get('topic', '')
+            # Find matching topic: exact title first, then any title
+            # contained in the script's topic
+            script_topic = script_data.get('topic', '').lower()
             visual_queries = []
             
-            for topic in topics_data.get('topics', []):
-                if topic['title'].lower() in script_topic.lower():
-                    visual_queries = topic.get('visual_queries', [])
-                    break
+            match = topics.get(script_topic)
+            if match is None:
+                match = next(
+                    (topic for title_lower, topic in topics.items() if title_lower in script_topic),
+                    None
+                )
+            
+            if match:
+                visual_queries = match.get('visual_queries', [])
             
             # Fallback to script tags if no visual queries found
             if not visual_queries:
@@ -219,24 +543,47 @@ class VisualsFetcher:
         
         print(f"\n📹 Fetching videos for queries: {visual_queries}")
         
-        downloaded_files = []
-        
         # Fetch 2 videos per query (can be adjusted)
         videos_per_query = 2
         
-        for idx, query in enumerate(visual_queries):
-            videos = self.search_videos(query, count=videos_per_query)
+        # Searches and downloads are network-bound, so run them on threads
+        # sharing the session's connection pool. Each query's downloads start
+        # as soon as its own search returns instead of waiting for all searches.
+        downloads = {}
+        
+        # Clear partial files left by a run that was killed mid-download.
+        # Other runs may share OUTPUT_DIR, so only files nobody has written
+        # to for a while are treated as abandoned
+        stale_before = time.time() - self.stale_part_age
+        for stale in (Path(self.output_dir) / 'clips').glob('*.part'):
+            try:
+                if stale.stat().st_mtime < stale_before:
+                    stale.unlink()
+            except OSError:
+                pass  # Finished or removed by its own run meanwhile
+        
+        with ThreadPoolExecutor(max_workers=max(1, len(visual_queries))) as search_executor, \
+                ThreadPoolExecutor(max_workers=self.max_downloads) as download_executor:
+            searches = {
+                search_executor.submit(self.search_videos, query, count=videos_per_query): idx
+                for idx, query in enumerate(visual_queries)
+            }
             
-            for vid_idx, video in enumerate(videos):
-                filename = f"clip_{idx}_{vid_idx}.mp4"
-                
+            for search in as_completed(searches):
+                idx = searches[search]
+                for vid_idx, video in enumerate(search.result()):
+                    filename = f"clip_{idx}_{vid_idx}.mp4"
+                    downloads[(idx, vid_idx)] = (
+                        filename,
+                        download_executor.submit(self.download_video, video['url'], filename)
+                    )
+            
+            # Collect in query order so clip order matches the queries
+            downloaded_files = []
+            for key in sorted(downloads):
+                filename, future = downloads[key]
                 try:
-                    filepath = self.download_video(video['url'], filename)
-                    downloaded_files.append(filepath)
-                    
-                    # Rate limiting - be nice to the API
-                    time.sleep(1)
-                    
+                    downloaded_files.append(future.result())
                 except Exception as e:
                     print(f"⚠️  Failed to download {filename}: {str(e)}")
                     continue
@@ -248,8 +595,7 @@ class VisualsFetcher:
             "total_clips": len(downloaded_files)
         }
         
-        with open(f'{self.output_dir}/visuals_metadata.json', 'w') as f:
-            json.dump(visuals_metadata, f, indent=2)
+        write_json(f'{self.output_dir}/visuals_metadata.json', visuals_metadata)
         
         print(f"\n✅ Downloaded {len(downloaded_files)} video clips")
         
@@ -260,30 +606,28 @@ def main():
     """Test the visuals fetcher"""
     
     try:
-        fetcher = VisualsFetcher()
-        
-        # Try to fetch based on existing script, or use default
-        output_dir = os.getenv('OUTPUT_DIR', 'output')
-        script_path = f"{output_dir}/script.json"
-        
-        if os.path.exists(script_path):
-            print(f"📄 Using script from: {script_path}\n")
-            video_files = fetcher.fetch_videos_for_script()
-        else:
-            print("⚠️  No script found. Fetching sample videos...\n")
+        with VisualsFetcher() as fetcher:
+            # Try to fetch based on existing script, or use default
+            output_dir = os.getenv('OUTPUT_DIR', 'output')
+            script_path = f"{output_dir}/script.json"
             
-            # Fetch some sample videos
-            sample_queries = ["technology", "nature", "city"]
-            video_files = []
-            
-            for query in sample_queries:
-                videos = fetcher.search_videos(query, count=2)
+            if os.path.exists(script_path):
+                print(f"📄 Using script from: {script_path}\n")
+                video_files = fetcher.fetch_videos_for_script()
+            else:
+                print("⚠️  No script found. Fetching sample videos...\n")
+                
+                # Fetch some sample videos
+                sample_queries = ["technology", "nature", "city"]
+                video_files = []
                 
-                for idx, video in enumerate(videos):
-                    filename = f"sample_{query}_{idx}.mp4"
-                    filepath = fetcher.download_video(video['url'], filename)
-                    video_files.append(filepath)
-                    time.sleep(1)
+                for query in sample_queries:
+                    videos = fetcher.search_videos(query, count=2)
+                    
+                    for idx, video in enumerate(videos):
+                        filename = f"sample_{query}_{idx}.mp4"
+                        filepath = fetcher.download_video(video['url'], filename)
+                        video_files.append(filepath)
         
         print("\n" + "="*60)
         print("✅ Video downloads complete!")
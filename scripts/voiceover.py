@@ -5,11 +5,17 @@ Converts text scripts to natural-sounding speech using Edge-TTS
 """
 
 import os
+import re
+import time
+import shutil
 import asyncio
+import tempfile
 import json
 from pathlib import Path
 from dotenv import load_dotenv
 
+from json_io import read_json, read_json_cached, write_json
+
 try:
     from edge_tts import Communicate, list_voices
     EDGE_TTS_AVAILABLE = True
@@ -24,12 +30,24 @@ load_dotenv()
 class VoiceoverGenerator:
     """Generate voiceovers using Edge-TTS"""
     
+    # The Edge voice catalogue rarely changes, so a week-old copy is fine
+    VOICES_CACHE_TTL = 7 * 24 * 60 * 60
+    
+    # Scripts over TTS_MAX_BYTES (roughly Edge-TTS' payload limit) are
+    # synthesized as up to TTS_CHUNKS sentence-aligned chunks, none larger
+    # than TTS_MAX_BYTES, with at most TTS_CONCURRENCY requests at once
+    TTS_MAX_BYTES = 3000
+    TTS_CHUNKS = 8
+    TTS_CONCURRENCY = 4
+    
     def __init__(self):
         if not EDGE_TTS_AVAILABLE:
             raise RuntimeError("edge-tts is required. Install with: pip install edge-tts")
         
         self.voice = os.getenv('TTS_VOICE', 'en-US-JennyNeural')
         self.output_dir = os.getenv('OUTPUT_DIR', 'output')
+        self.voices_cache = Path(self.output_dir) / '.cache' / 'voices.json'
+        self._voices_by_language = {}
         
     async def generate_voiceover(
         self, 
@@ -62,17 +80,21 @@ class VoiceoverGenerator:
         output_path = audio_dir / output_filename
         
         try:
-            # Create communicate instance
-            communicate = Communicate(
-                text=text,
-                voice=self.voice,
-                rate=rate,
-                volume=volume,
-                pitch=pitch
-            )
-            
-            # Save audio
-            await communicate.save(str(output_path))
+            if len(text.encode('utf-8')) > self.TTS_MAX_BYTES:
+                chunks = self._split_sentences(text)
+                await self._generate_chunked(chunks, output_path, rate, volume, pitch)
+            else:
+                # Create communicate instance
+                communicate = Communicate(
+                    text=text,
+                    voice=self.voice,
+                    rate=rate,
+                    volume=volume,
+                    pitch=pitch
+                )
+                
+                # Save audio
+                await communicate.save(str(output_path))
             
             print(f"✅ Voiceover saved to: {output_path}")
             print(f"📏 Text length: {len(text)} characters")
@@ -82,6 +104,115 @@ class VoiceoverGenerator:
         except Exception as e:
             raise RuntimeError(f"Failed to generate voiceover: {str(e)}")
     
+    def _split_sentences(self, text: str) -> list:
+        """Group the script's sentences into chunks of similar size (in UTF-8 bytes)"""
+        
+        sentences = [s for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s]
+        target = min(len(text.encode('utf-8')) / self.TTS_CHUNKS, self.TTS_MAX_BYTES)
+        
+        chunks = []
+        current = []
+        current_len = 0
+        pieces = [piece for sentence in sentences for piece in self._fit_sentence(sentence)]
+        for sentence in pieces:
+            size = len(sentence.encode('utf-8')) + 1
+            
+            # Start a new chunk rather than go over the payload limit
+            if current and current_len + size > self.TTS_MAX_BYTES:
+                chunks.append(' '.join(current))
+                current = []
+                current_len = 0
+            
+            current.append(sentence)
+            current_len += size
+            if current_len >= target:
+                chunks.append(' '.join(current))
+                current = []
+                current_len = 0
+        
+        if current:
+            chunks.append(' '.join(current))
+        
+        return chunks
+    
+    def _fit_sentence(self, sentence: str) -> list:
+        """
+        Split a sentence longer than TTS_MAX_BYTES into pieces that fit
+        
+        Breaks between words; a single word over the limit is cut on a
+        character boundary as a last resort.
+        """
+        
+        if len(sentence.encode('utf-8')) <= self.TTS_MAX_BYTES:
+            return [sentence]
+        
+        pieces = []
+        current = []
+        current_len = 0
+        for word in sentence.split():
+            word_len = len(word.encode('utf-8'))
+            
+            if current and current_len + 1 + word_len > self.TTS_MAX_BYTES:
+                pieces.append(' '.join(current))
+                current = []
+                current_len = 0
+            
+            while word_len > self.TTS_MAX_BYTES:
+                head = word.encode('utf-8')[:self.TTS_MAX_BYTES].decode('utf-8', 'ignore')
+                pieces.append(head)
+                word = word[len(head):]
+                word_len = len(word.encode('utf-8'))
+            
+            current_len += word_len + (1 if current else 0)
+            current.append(word)
+        
+        if current:
+            pieces.append(' '.join(current))
+        
+        return pieces
+    
+    async def _generate_chunked(
+        self,
+        chunks: list,
+        output_path: Path,
+        rate: str,
+        volume: str,
+        pitch: str
+    ) -> None:
+        """
+        Synthesize chunks concurrently and join them into one file
+        
+        Edge-TTS returns constant-bitrate MP3, so the parts can be
+        concatenated byte for byte in script order.
+        """
+        
+        semaphore = asyncio.Semaphore(self.TTS_CONCURRENCY)
+        
+        with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp_dir:
+            part_paths = [Path(tmp_dir) / f"part_{i:03d}.mp3" for i in range(len(chunks))]
+            
+            async def synthesize(chunk: str, part_path: Path) -> None:
+                async with semaphore:
+                    communicate = Communicate(
+                        text=chunk,
+                        voice=self.voice,
+                        rate=rate,
+                        volume=volume,
+                        pitch=pitch
+                    )
+                    await communicate.save(str(part_path))
+            
+            print(f"   Synthesizing {len(chunks)} chunks in parallel")
+            await asyncio.gather(*(
+                synthesize(chunk, part_path)
+                for chunk, part_path in zip(chunks, part_paths)
+            ))
+            
+            with open(output_path, 'wb') as out:
+                for part_path in part_paths:
+                    with open(part_path, 'rb') as part:
+                        shutil.copyfileobj(part, out)
+    
     async def get_available_voices(self, language: str = "en") -> list:
         """
         Get list of available voices for a language
@@ -93,13 +224,31 @@ class VoiceoverGenerator:
             List of voice dictionaries
         """
         
+        if language not in self._voices_by_language:
+            voices = await self._cached_list_voices()
+            self._voices_by_language[language] = [
+                v for v in voices 
+                if v["Locale"].startswith(language)
+            ]
+        
+        return self._voices_by_language[language]
+    
+    async def _cached_list_voices(self) -> list:
+        """Fetch the voice catalogue, reusing the on-disk copy for a week"""
+        
+        try:
+            age = time.time() - self.voices_cache.stat().st_mtime
+            if age < self.VOICES_CACHE_TTL:
+                return read_json(self.voices_cache)
+        except (OSError, ValueError):
+            pass  # Missing or corrupt cache, fetch again
+        
         voices = await list_voices()
-        filtered_voices = [
-            v for v in voices 
-            if v["Locale"].startswith(language)
-        ]
         
-        return filtered_voices
+        self.voices_cache.parent.mkdir(parents=True, exist_ok=True)
+        write_json(self.voices_cache, voices)
+        
+        return voices
     
     def display_voice_options(self):
         """Display available voice options"""
@@ -140,8 +289,7 @@ async def generate_from_script_file(script_path: str = None) -> str:
     
     # Load script
     try:
-        with open(script_path, 'r') as f:
-            script_data = json.load(f)
+        script_data = read_json_cached(script_path)
         
         text = script_data.get('script', '')
         
@@ -166,8 +314,7 @@ async def generate_from_script_file(script_path: str = None) -> str:
     }
     
     output_dir = os.getenv('OUTPUT_DIR', 'output')
-    with open(f'{output_dir}/audio_metadata.json', 'w') as f:
-        json.dump(audio_metadata, f, indent=2)
+    write_json(f'{output_dir}/audio_metadata.json', audio_metadata)
     
     return audio_path
 
@@ -214,8 +361,7 @@ def main():
             "tags": ["AI", "technology", "future"]
         }
         
-        with open(test_script_path, 'w') as f:
-            json.dump(sample_data, f, indent=2)
+        write_json(test_script_path, sample_data)
         
         script_path = test_script_path
     
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for splitting long scripts into Edge-TTS sized chunks
+Run with: python -m unittest discover tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from voiceover import VoiceoverGenerator
+
+
+class SplitSentencesTest(unittest.TestCase):
+    """VoiceoverGenerator._split_sentences"""
+    
+    def setUp(self):
+        # Splitting needs none of the state __init__ sets up (or edge-tts)
+        self.generator = VoiceoverGenerator.__new__(VoiceoverGenerator)
+        self.limit = VoiceoverGenerator.TTS_MAX_BYTES
+    
+    def assert_chunks_fit(self, text: str, chunks: list) -> None:
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk.encode('utf-8')), self.limit)
+        self.assertEqual(''.join(''.join(chunks).split()), ''.join(text.split()))
+    
+    def test_single_5kb_sentence_is_split_between_words(self):
+        text = ' '.join(['word'] * 1024) + '.'
+        self.assertGreater(len(text.encode('utf-8')), 5000)
+        
+        chunks = self.generator._split_sentences(text)
+        
+        self.assertGreater(len(chunks), 1)
+        self.assert_chunks_fit(text, chunks)
+        self.assertEqual(' '.join(chunks).split(), text.split())
+    
+    def test_single_5kb_word_is_cut_on_character_boundaries(self):
+        text = 'é' * 2600
+        
+        chunks = self.generator._split_sentences(text)
+        
+        self.assertGreater(len(chunks), 1)
+        self.assert_chunks_fit(text, chunks)
+    
+    def test_many_sentences_keep_order_and_fit(self):
+        text = ' '.join(f"Sentence number {i} is here." for i in range(400))
+        
+        chunks = self.generator._split_sentences(text)
+        
+        self.assert_chunks_fit(text, chunks)
+        self.assertEqual(' '.join(chunks), text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,21 +8,44 @@ import os
 import sys
 import json
 import base64
+import shutil
+import hashlib
+import tempfile
 import subprocess
 from pathlib import Path
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
 except ImportError:
     print("❌ Error: requests library not installed")
     print("Install with: pip install requests")
     sys.exit(1)
 
+try:
+    import pathspec
+    PATHSPEC_AVAILABLE = True
+except ImportError:
+    PATHSPEC_AVAILABLE = False
+
 
 class GitHubUploader:
     """Automate GitHub repository creation and file upload"""
     
+    # Never uploaded, whatever .gitignore says
+    ALWAYS_IGNORE = [".git/", "__pycache__/", "*.pyc", ".DS_Store", ".env"]
+    
+    # Blobs created at once by the API upload
+    UPLOAD_WORKERS = 8
+    
+    # Read size when streaming files for base64 and hashing. Base64 turns
+    # every 3 input bytes into 4 characters, so with a multiple of 3 only
+    # the last chunk can end in "=" padding and the encoded chunks
+    # concatenate into one valid string
+    B64_READ_SIZE = 57 * 1024
+    
     def __init__(self, token: str, username: str, repo_name: str):
         self.token = token
         self.username = username
@@ -32,6 +55,27 @@ class GitHubUploader:
             "Authorization": f"token {token}",
             "Accept": "application/vnd.github.v3+json"
         }
+        
+        # Shared session so API calls reuse connections; the pool is sized
+        # for the parallel blob uploads so each worker keeps its connection
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.UPLOAD_WORKERS))
+        
+        self.repo_url = f"{self.api_base}/repos/{self.username}/{self.repo_name}"
+        self.git_remote = f"https://github.com/{self.username}/{self.repo_name}.git"
+        self._ignore_spec = None
+    
+    def close(self) -> None:
+        """Close pooled HTTP connections"""
+        
+        self.session.close()
+    
+    def __enter__(self) -> "GitHubUploader":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
     
     def create_repository(self, description: str, private: bool = False) -> bool:
         """Create a new GitHub repository"""
@@ -47,7 +91,7 @@ class GitHubUploader:
         
         print(f"🔨 Creating repository: {self.username}/{self.repo_name}")
         
-        response = requests.post(url, headers=self.headers, json=data)
+        response = self.session.post(url, json=data)
         
         if response.status_code == 201:
             print(f"✅ Repository created successfully!")
@@ -61,41 +105,64 @@ class GitHubUploader:
             return False
     
     def get_file_content(self, filepath: Path) -> str:
-        """Read and base64 encode file content"""
+        """
+        Read and base64 encode file content
+        
+        Encodes the file chunk by chunk, so the raw bytes and their encoding
+        are never in memory at the same time.
+        """
         
         try:
+            encoded = bytearray()
             with open(filepath, 'rb') as f:
-                content = f.read()
-            return base64.b64encode(content).decode('utf-8')
+                while chunk := f.read(self.B64_READ_SIZE):
+                    encoded += base64.b64encode(chunk)
+            return encoded.decode('ascii')
         except Exception as e:
             print(f"❌ Error reading {filepath}: {e}")
             return None
     
+    def get_blob_sha(self, filepath: Path) -> Optional[str]:
+        """Git blob SHA-1 of a file, the same id GitHub reports for its content"""
+        
+        try:
+            digest = hashlib.sha1(b"blob %d\0" % os.path.getsize(filepath))
+            with open(filepath, 'rb') as f:
+                while chunk := f.read(self.B64_READ_SIZE):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        except OSError as e:
+            print(f"❌ Error reading {filepath}: {e}")
+            return None
+    
     def upload_file(self, filepath: Path, github_path: str) -> bool:
-        """Upload a single file to GitHub"""
+        """Upload a single file to GitHub (a no-op if its content is unchanged)"""
+        
+        url = f"{self.repo_url}/contents/{github_path}"
         
-        url = f"{self.api_base}/repos/{self.username}/{self.repo_name}/contents/{github_path}"
+        # Check if file already exists
+        response = self.session.get(url)
+        existing = response.json() if response.status_code == 200 else None
+        
+        if existing and existing.get("sha") == self.get_blob_sha(filepath):
+            return True
         
         # Get file content
         content = self.get_file_content(filepath)
         if content is None:
             return False
         
-        # Check if file already exists
-        response = requests.get(url, headers=self.headers)
-        
         data = {
             "message": f"Add {github_path}",
             "content": content
         }
         
         # If file exists, need to provide sha for update
-        if response.status_code == 200:
-            existing = response.json()
+        if existing:
             data["sha"] = existing["sha"]
             data["message"] = f"Update {github_path}"
         
-        response = requests.put(url, headers=self.headers, json=data)
+        response = self.session.put(url, json=data)
         
         if response.status_code in [200, 201]:
             return True
@@ -103,67 +170,368 @@ class GitHubUploader:
             print(f"❌ Failed to upload {github_path}: {response.status_code}")
             return False
     
-    def should_ignore(self, path: Path, gitignore_patterns: List[str]) -> bool:
-        """Check if file should be ignored based on .gitignore"""
+    def should_ignore(self, relative_path: str, gitignore_patterns: List[str]) -> bool:
+        """
+        Check if file should be ignored based on .gitignore
+        
+        relative_path is relative to the uploaded directory, with a trailing
+        "/" for directories. With pathspec installed the patterns are compiled
+        once into a single matcher with real gitignore semantics (wildcards,
+        negation, anchoring); otherwise a plain substring check is used.
+        """
         
-        path_str = str(path)
+        if PATHSPEC_AVAILABLE:
+            if self._ignore_spec is None:
+                self._ignore_spec = pathspec.PathSpec.from_lines(
+                    "gitwildmatch",
+                    gitignore_patterns + self.ALWAYS_IGNORE
+                )
+            return self._ignore_spec.match_file(relative_path)
         
         # Always ignore these
-        always_ignore = ['.git', '__pycache__', '.pyc', '.DS_Store', '.env']
+        always_ignore = ['.git/', '__pycache__', '.pyc', '.DS_Store']
         for pattern in always_ignore:
-            if pattern in path_str:
+            if pattern in relative_path:
                 return True
         
+        if os.path.basename(relative_path.rstrip('/')) == '.env':
+            return True
+        
         # Check gitignore patterns
         for pattern in gitignore_patterns:
-            if pattern.strip() and not pattern.startswith('#'):
-                if pattern in path_str or path_str.endswith(pattern):
+            if pattern and not pattern.startswith('#'):
+                pattern = pattern.lstrip('/')
+                if pattern in relative_path or relative_path.endswith(pattern):
                     return True
         
         return False
     
     def upload_directory(self, source_dir: Path, prefix: str = "") -> Dict[str, int]:
-        """Upload entire directory structure"""
+        """
+        Upload entire directory structure as a single commit
+        
+        Pushes with the local git binary when it is installed, which sends
+        every file in one packfile and honors .gitignore natively. Falls back
+        to the Git Data API when git is missing or the push fails.
+        """
+        
+        if not prefix and shutil.which("git"):
+            stats = self.push_with_git(source_dir)
+            if stats is not None:
+                return stats
+            print("⚠️  git push failed, falling back to the GitHub API")
+        
+        return self._upload_with_api(source_dir, prefix)
+    
+    def push_with_git(self, source_dir: Path) -> Optional[Dict[str, int]]:
+        """
+        Commit the directory on top of the remote branch and push it with git
+        
+        The commit is built in a throwaway git directory, so an existing
+        .git in source_dir is never touched. The token goes to git through
+        GIT_CONFIG_* environment variables rather than the remote URL, so it
+        never lands in a config file or the process list.
+        
+        Returns the stats dict, or None if the push did not succeed.
+        """
+        
+        branch = self._get_default_branch()
+        auth = base64.b64encode(f"x-access-token:{self.token}".encode()).decode()
+        
+        with tempfile.TemporaryDirectory() as git_dir:
+            env = {
+                **os.environ,
+                "GIT_DIR": git_dir,
+                "GIT_WORK_TREE": str(source_dir),
+                "GIT_TERMINAL_PROMPT": "0",
+                "GIT_CONFIG_COUNT": "1",
+                "GIT_CONFIG_KEY_0": "http.extraHeader",
+                "GIT_CONFIG_VALUE_0": f"Authorization: Basic {auth}"
+            }
+            
+            def git(*args: str) -> subprocess.CompletedProcess:
+                return subprocess.run(
+                    ["git", *args],
+                    cwd=source_dir,
+                    env=env,
+                    capture_output=True,
+                    text=True
+                )
+            
+            if git("init", "-q").returncode != 0:
+                return None
+            
+            # Same files the API path always leaves out, on top of .gitignore
+            exclude = Path(git_dir) / "info" / "exclude"
+            exclude.parent.mkdir(exist_ok=True)
+            exclude.write_text("\n".join(self.ALWAYS_IGNORE) + "\n")
+            
+            # Build on the current remote tip so the push is a fast-forward;
+            # an empty repository simply gets a root commit
+            if git("fetch", "-q", "--depth=1", self.git_remote, branch).returncode == 0:
+                git("reset", "-q", "FETCH_HEAD")
+            
+            # --ignore-removal keeps remote files that don't exist locally,
+            # matching the API upload
+            if git("add", "--ignore-removal", ".").returncode != 0:
+                return None
+            
+            changed = git("diff", "--cached", "--name-only", "-z").stdout.split("\0")
+            changed = [path for path in changed if path]
+            ignored = git("ls-files", "--others", "--ignored", "--exclude-standard", "-z").stdout.split("\0")
+            stats = {"success": 0, "failed": 0, "skipped": len([path for path in ignored if path])}
+            
+            if not changed:
+                print("✅ Remote is already up to date")
+                return stats
+            
+            for path in changed:
+                print(f"📤 Uploading: {path}")
+            
+            commit = git(
+                "-c", f"user.name={self.username}",
+                "-c", f"user.email={self.username}@users.noreply.github.com",
+                "commit", "-q", "-m", f"Upload {len(changed)} files"
+            )
+            if commit.returncode != 0:
+                return None
+            
+            push = git("push", "--porcelain", self.git_remote, f"HEAD:refs/heads/{branch}")
+            
+            # Porcelain prints one "<flag>\t<from>:<to>\t<summary>" line per
+            # ref; a "!" flag marks a rejected update
+            refs = [line for line in push.stdout.splitlines() if "\t" in line]
+            if push.returncode != 0 or not refs or any(line.startswith("!") for line in refs):
+                print(f"❌ git push failed: {push.stderr.strip() or push.stdout.strip()}")
+                return None
+            
+            stats["success"] = len(changed)
+            return stats
+    
+    def _upload_with_api(self, source_dir: Path, prefix: str = "") -> Dict[str, int]:
+        """
+        Upload the directory through the Git Data API as a single commit
+        
+        One blob per file (created in parallel), then one tree, one commit
+        and one ref update, instead of a GET + PUT round trip per file
+        through the Contents API.
+        """
         
         # Read .gitignore
         gitignore_file = source_dir / '.gitignore'
         gitignore_patterns = []
         if gitignore_file.exists():
-            with open(gitignore_file, 'r') as f:
-                gitignore_patterns = f.readlines()
+            gitignore_patterns = [line.strip() for line in gitignore_file.read_text().splitlines()]
         
+        self._ignore_spec = None
         stats = {"success": 0, "failed": 0, "skipped": 0}
+        uploads = []
+        
+        modes = {}
         
-        # Walk through directory
-        for root, dirs, files in os.walk(source_dir):
-            root_path = Path(root)
+        # Walk with scandir: file types come from the directory listing, and
+        # ignored directories are pruned before they are ever read
+        pending = [(source_dir, "")]
+        while pending:
+            directory, relative_root = pending.pop()
             
-            # Skip ignored directories
-            dirs[:] = [d for d in dirs if not self.should_ignore(root_path / d, gitignore_patterns)]
+            # Like os.walk, skip directories that can't be listed
+            try:
+                entries = os.scandir(directory)
+            except OSError as e:
+                print(f"⚠️  Cannot read {directory}: {e}")
+                continue
             
-            for filename in files:
-                filepath = root_path / filename
-                
-                # Skip ignored files
-                if self.should_ignore(filepath, gitignore_patterns):
-                    stats["skipped"] += 1
-                    continue
-                
-                # Calculate relative path for GitHub
-                relative_path = filepath.relative_to(source_dir)
-                github_path = str(relative_path).replace('\\', '/')
-                
-                if prefix:
-                    github_path = f"{prefix}/{github_path}"
-                
-                print(f"📤 Uploading: {github_path}")
-                
-                if self.upload_file(filepath, github_path):
-                    stats["success"] += 1
-                else:
-                    stats["failed"] += 1
+            with entries:
+                for entry in entries:
+                    relative_path = f"{relative_root}{entry.name}"
+                    
+                    # Like os.walk, don't descend into symlinked directories
+                    if entry.is_dir():
+                        if not entry.is_symlink() and \
+                                not self.should_ignore(f"{relative_path}/", gitignore_patterns):
+                            pending.append((Path(entry.path), f"{relative_path}/"))
+                        continue
+                    
+                    # Skip ignored files
+                    if self.should_ignore(relative_path, gitignore_patterns):
+                        stats["skipped"] += 1
+                        continue
+                    
+                    github_path = f"{prefix}/{relative_path}" if prefix else relative_path
+                    
+                    # A broken symlink or a file deleted mid-walk fails on its
+                    # own instead of aborting the upload
+                    try:
+                        st_mode = entry.stat().st_mode
+                    except OSError as e:
+                        print(f"❌ Error reading {entry.path}: {e}")
+                        stats["failed"] += 1
+                        continue
+                    
+                    modes[github_path] = "100755" if st_mode & 0o111 else "100644"
+                    uploads.append((Path(entry.path), github_path))
+        
+        if not uploads:
+            return stats
+        
+        branch = self._get_default_branch()
+        head = self._get_branch_head(branch)
+        
+        # The Git Data API can't write to an empty repository, so seed it
+        # with one file through the Contents API first
+        if head is None:
+            filepath, github_path = uploads.pop(0)
+            print(f"📤 Uploading: {github_path}")
+            if self.upload_file(filepath, github_path):
+                stats["success"] += 1
+            else:
+                stats["failed"] += 1
+                return stats
+            
+            head = self._get_branch_head(branch)
+            if head is None or not uploads:
+                stats["failed"] += len(uploads)
+                return stats
+        
+        head_commit_sha, head_tree_sha = head
+        
+        # Files whose blob and mode already match the branch head need no
+        # upload at all
+        remote = self._get_tree_entries(head_tree_sha)
+        changed = []
+        for filepath, github_path in uploads:
+            if remote.get(github_path) == (modes[github_path], self.get_blob_sha(filepath)):
+                stats["skipped"] += 1
+            else:
+                changed.append((filepath, github_path))
+        uploads = changed
+        
+        if not uploads:
+            print("✅ Remote is already up to date")
+            return stats
+        
+        def create_blob(upload: Tuple[Path, str]) -> Optional[str]:
+            filepath, github_path = upload
+            print(f"📤 Uploading: {github_path}")
+            
+            content = self.get_file_content(filepath)
+            if content is None:
+                return None
+            
+            response = self.session.post(
+                f"{self.repo_url}/git/blobs",
+                json={"content": content, "encoding": "base64"}
+            )
+            if response.status_code != 201:
+                print(f"❌ Failed to upload {github_path}: {response.status_code}")
+                return None
+            
+            return response.json()["sha"]
+        
+        with ThreadPoolExecutor(max_workers=self.UPLOAD_WORKERS) as executor:
+            blob_shas = list(executor.map(create_blob, uploads))
+        
+        tree = []
+        for (filepath, github_path), blob_sha in zip(uploads, blob_shas):
+            if blob_sha is None:
+                stats["failed"] += 1
+                continue
+            
+            tree.append({
+                "path": github_path,
+                "mode": modes[github_path],
+                "type": "blob",
+                "sha": blob_sha
+            })
+        
+        if not tree:
+            return stats
+        
+        if self._commit_tree(branch, head_commit_sha, head_tree_sha, tree):
+            stats["success"] += len(tree)
+        else:
+            stats["failed"] += len(tree)
         
         return stats
+    
+    def _get_default_branch(self) -> str:
+        """Name of the repository's default branch"""
+        
+        response = self.session.get(self.repo_url)
+        if response.status_code == 200:
+            return response.json().get("default_branch") or "main"
+        return "main"
+    
+    def _get_branch_head(self, branch: str) -> Optional[Tuple[str, str]]:
+        """(commit sha, tree sha) at the tip of a branch, or None if it has no commits"""
+        
+        response = self.session.get(f"{self.repo_url}/git/ref/heads/{branch}")
+        if response.status_code != 200:
+            return None
+        
+        commit_sha = response.json()["object"]["sha"]
+        
+        response = self.session.get(f"{self.repo_url}/git/commits/{commit_sha}")
+        if response.status_code != 200:
+            return None
+        
+        return commit_sha, response.json()["tree"]["sha"]
+    
+    def _get_tree_entries(self, tree_sha: str) -> Dict[str, Tuple[str, str]]:
+        """Map each file path in a tree (recursively) to its (mode, blob sha)"""
+        
+        response = self.session.get(f"{self.repo_url}/git/trees/{tree_sha}", params={"recursive": "1"})
+        if response.status_code != 200:
+            return {}
+        
+        # A truncated listing just means some unchanged files get re-sent
+        return {
+            entry["path"]: (entry["mode"], entry["sha"])
+            for entry in response.json().get("tree", [])
+            if entry.get("type") == "blob"
+        }
+    
+    def _commit_tree(
+        self,
+        branch: str,
+        parent_sha: str,
+        base_tree_sha: str,
+        tree: List[Dict]
+    ) -> bool:
+        """Create a tree and commit on top of the branch head, then move the branch to it"""
+        
+        response = self.session.post(
+            f"{self.repo_url}/git/trees",
+            json={"base_tree": base_tree_sha, "tree": tree}
+        )
+        if response.status_code != 201:
+            print(f"❌ Failed to create tree: {response.status_code}")
+            return False
+        tree_sha = response.json()["sha"]
+        
+        response = self.session.post(
+            f"{self.repo_url}/git/commits",
+            json={
+                "message": f"Upload {len(tree)} files",
+                "tree": tree_sha,
+                "parents": [parent_sha]
+            }
+        )
+        if response.status_code != 201:
+            print(f"❌ Failed to create commit: {response.status_code}")
+            return False
+        commit_sha = response.json()["sha"]
+        
+        response = self.session.patch(
+            f"{self.repo_url}/git/refs/heads/{branch}",
+            json={"sha": commit_sha}
+        )
+        if response.status_code != 200:
+            print(f"❌ Failed to update {branch}: {response.status_code}")
+            return False
+        
+        return True
 
 
 def main():
@@ -215,26 +583,25 @@ def main():
     print()
     
     # Initialize uploader
-    uploader = GitHubUploader(token, USERNAME, REPO_NAME)
-    
-    # Create repository
-    if not uploader.create_repository(DESCRIPTION, private=False):
-        print("❌ Failed to create/access repository")
-        sys.exit(1)
-    
-    print()
-    
-    # Get project directory
-    project_dir = Path(__file__).parent.resolve()
-    print(f"📂 Project directory: {project_dir}")
-    print()
-    
-    # Upload files
-    print("📤 Uploading files...")
-    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-    print()
-    
-    stats = uploader.upload_directory(project_dir)
+    with GitHubUploader(token, USERNAME, REPO_NAME) as uploader:
+        # Create repository
+        if not uploader.create_repository(DESCRIPTION, private=False):
+            print("❌ Failed to create/access repository")
+            sys.exit(1)
+        
+        print()
+        
+        # Get project directory
+        project_dir = Path(__file__).parent.resolve()
+        print(f"📂 Project directory: {project_dir}")
+        print()
+        
+        # Upload files
+        print("📤 Uploading files...")
+        print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        print()
+        
+        stats = uploader.upload_directory(project_dir)
     
     print()
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")